@@ -1,4 +1,4 @@
 from django.contrib import admin
-from .models import Sprint, UserStory, TestCase, TestResult, Defect, Comment, Effort
+from .models import Sprint, UserStory, TestCase, TestResult, Defect, Comment, Effort, ImportJob
 
-admin.site.register([Sprint, UserStory, TestCase, TestResult, Defect, Comment, Effort])
\ No newline at end of file
+admin.site.register([Sprint, UserStory, TestCase, TestResult, Defect, Comment, Effort, ImportJob])
\ No newline at end of file
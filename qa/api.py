@@ -0,0 +1,79 @@
+"""Read-only NDJSON API over every model.
+
+``GET /api/<resource>/`` streams one JSON object per line, straight from
+``values_list().iterator()``, so memory stays flat and no model instances
+are built however many rows match. Query parameters:
+
+* ``fields`` - comma-separated column names (foreign keys as ``sprint_id``);
+  defaults to every column.
+* ``<field>`` or ``<field>__<lookup>`` - filters; ``__in`` takes a
+  comma-separated list and ``__isnull`` takes ``true``/``false``.
+* ``cursor`` / ``limit`` - resume after an id and cap the row count.
+"""
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Sprint, UserStory, TestCase, TestResult, Defect, Effort, Comment
+
+STREAM_CHUNK_SIZE = getattr(settings, "QA_STREAM_CHUNK_SIZE", 2000)
+
+RESOURCES = {
+    "sprints": Sprint,
+    "userstories": UserStory,
+    "testcases": TestCase,
+    "testresults": TestResult,
+    "defects": Defect,
+    "efforts": Effort,
+    "comments": Comment,
+}
+
+LOOKUPS = {"exact", "in", "gt", "gte", "lt", "lte", "icontains", "isnull"}
+RESERVED = {"fields", "cursor", "limit"}
+
+
+def field_names(model):
+    """Column attribute names of ``model``, with foreign keys as ``<name>_id``."""
+    return [f.attname for f in model._meta.concrete_fields]
+
+
+def build_query(model, params):
+    """Return ``(queryset, fields)`` for the request parameters; raises ValueError on bad input."""
+    known = field_names(model)
+    fields = [f.strip() for f in params.get("fields", "").split(",") if f.strip()] or known
+    unknown = [f for f in fields if f not in known]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    filters = {}
+    for key, value in params.items():
+        if key in RESERVED:
+            continue
+        name, _, lookup = key.partition("__")
+        if name not in known or (lookup and lookup not in LOOKUPS):
+            raise ValueError(f"Unsupported filter: {key}")
+        if lookup == "in":
+            value = value.split(",")
+        elif lookup == "isnull":
+            value = value.lower() in ("1", "true", "yes")
+        filters[key] = value
+
+    qs = model.objects.filter(**filters).order_by("id")
+    if params.get("cursor"):
+        qs = qs.filter(id__gt=int(params["cursor"]))
+    if params.get("limit"):
+        qs = qs[:int(params["limit"])]
+    return qs, fields
+
+
+def stream_rows(qs, fields, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield NDJSON text, one chunk of rows at a time."""
+    encoder = DjangoJSONEncoder()
+    lines = []
+    for row in qs.values_list(*fields).iterator(chunk_size=chunk_size):
+        lines.append(encoder.encode(dict(zip(fields, row))))
+        if len(lines) >= chunk_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
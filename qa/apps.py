@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class QaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'qa'
+
+    def ready(self):
+        from . import receivers
+        post_migrate.connect(receivers.create_search_vector, sender=self)
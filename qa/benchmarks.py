@@ -0,0 +1,363 @@
+"""Benchmarks for the import engine and list views, run through ``manage.py benchmark``."""
+import json
+import os
+import random
+import resource
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import CACHE_ALIAS
+from .importer import SHEETS, normalize_dates, safe_date
+from .jobs import claim_next, run_job
+from .models import (Sprint, UserStory, TestCase, TestResult, Defect, Effort,
+                     DefectStatus, DefectSeverity, DefectPriority, EffortType,
+                     ImportJobStatus, UserStoryStatus)
+
+
+def best_of(fn, repeat):
+    """Return the fastest of ``repeat`` runs of ``fn`` in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def date_columns(rows, seed=0):
+    """Date columns shaped like the ones our exports produce."""
+    rng = np.random.default_rng(seed)
+    serials = pd.Series(rng.uniform(40000, 46000, rows))
+    stamps = pd.Series(pd.to_datetime(serials, unit="D", origin="1899-12-30"))
+    iso = stamps.dt.strftime("%Y-%m-%dT%H:%M:%S").astype(object)
+    mixed = pd.concat([stamps.astype(object), serials, iso], ignore_index=True)
+    mixed = mixed.sample(n=rows, random_state=seed, ignore_index=True)
+    mixed[rng.random(rows) < 0.05] = None
+    return {
+        "datetime64": stamps,
+        "excel serial": serials,
+        "iso strings": iso,
+        "mixed": mixed,
+    }
+
+
+def bench_dates(rows=100_000, repeat=3):
+    """Compare per-cell ``safe_date`` with ``normalize_dates`` on each kind of column."""
+    results = []
+    for name, column in date_columns(rows).items():
+        per_cell = best_of(lambda: [safe_date(v) for v in column], repeat)
+        vectorized = best_of(lambda: normalize_dates(column), repeat)
+        same = normalize_dates(column).tolist() == [safe_date(v) for v in column]
+        results.append({
+            "column": name,
+            "safe_date": per_cell,
+            "normalize_dates": vectorized,
+            "speedup": per_cell / vectorized if vectorized else float("inf"),
+            "same": same,
+        })
+    return results
+
+
+def seed_rows(defects, stories_per_sprint=50, defects_per_story=20, batch_size=10_000):
+    """Insert ``defects`` defects plus matching sprints, stories and efforts.
+
+    Stories get ``defects_per_story`` defects and half as many efforts;
+    ``created_at``/``logged_at`` are spread over 100 days so time-range
+    queries have something to select. Returns ``(sprint_ids, story_ids)``.
+    """
+    stories = max(defects // defects_per_story, 1)
+    sprints = max(stories // stories_per_sprint, 1)
+    statuses = DefectStatus.values
+    efforts = EffortType.values
+
+    Sprint.objects.bulk_create(
+        [Sprint(name=f"Sprint {i}", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+         for i in range(sprints)], batch_size=batch_size)
+    sprint_ids = list(Sprint.objects.order_by("id").values_list("id", flat=True))[-sprints:]
+    UserStory.objects.bulk_create(
+        [UserStory(sprint_id=sprint_ids[i % sprints], title=f"Story {i}") for i in range(stories)],
+        batch_size=batch_size)
+    story_ids = list(UserStory.objects.order_by("id").values_list("id", flat=True))[-stories:]
+
+    for start in range(0, defects, batch_size):
+        stop = min(start + batch_size, defects)
+        Defect.objects.bulk_create(
+            [Defect(user_story_id=story_ids[i // defects_per_story], title=f"Defect {i}",
+                    status=statuses[i % len(statuses)]) for i in range(start, stop)])
+        Effort.objects.bulk_create(
+            [Effort(user_story_id=story_ids[i // defects_per_story], user="qa",
+                    effort_type=efforts[i % len(efforts)], hours=1) for i in range(start, stop, 2)])
+
+    # auto_now_add stamps every row with now(); spread them over the last 100 days instead.
+    now = timezone.now()
+    for model, field in ((Defect, "created_at"), (Effort, "logged_at")):
+        ids = model.objects.order_by("id").values_list("id", flat=True)
+        first, last = ids.first(), ids.last()
+        step = max((last - first + 1) // 100, 1)
+        for day, start in enumerate(range(first, last + 1, step)):
+            model.objects.filter(id__gte=start, id__lt=start + step).update(
+                **{field: now - timedelta(days=100 - day)})
+    return sprint_ids, story_ids
+
+
+def index_queries(sprint_id, story_id, since):
+    """The filter shapes the list views and time-range reports issue."""
+    open_statuses = [DefectStatus.OPEN, DefectStatus.IN_PROGRESS]
+    return {
+        "defects by sprint+status": Defect.objects.filter(
+            user_story__sprint_id=sprint_id, status=DefectStatus.OPEN).order_by("id")[:100],
+        "defects by story+status": Defect.objects.filter(
+            user_story_id=story_id, status=DefectStatus.OPEN).order_by("id")[:100],
+        "defects by status": Defect.objects.filter(status=DefectStatus.CLOSED).order_by("id")[:100],
+        "open defects of story": Defect.objects.filter(
+            user_story_id=story_id, status__in=open_statuses).order_by("id")[:100],
+        "defects created since": Defect.objects.filter(created_at__gte=since).order_by("created_at")[:100],
+        "stories of sprint": UserStory.objects.filter(sprint_id=sprint_id).order_by("id")[:100],
+        "efforts of story": Effort.objects.filter(user_story_id=story_id).order_by("id")[:100],
+        "efforts logged since": Effort.objects.filter(logged_at__gte=since).order_by("logged_at")[:100],
+    }
+
+
+def bench_indexes(rows=1_000_000, repeat=5):
+    """Time the view query shapes with and without the model indexes.
+
+    Seeds ``rows`` defects inside a transaction that is rolled back at the
+    end, so run it against a scratch database: dropping indexes locks the
+    tables until then. Returns ``{query: {"before": {...}, "after": {...}}}``
+    with the best time and the query plan of each phase.
+    """
+    models = [UserStory, TestCase, TestResult, Defect, Effort]
+    editor = connection.schema_editor()
+    results = {}
+    with transaction.atomic():
+        sprint_ids, story_ids = seed_rows(rows)
+        since = timezone.now() - timedelta(days=1)
+        queries = index_queries(sprint_ids[len(sprint_ids) // 2], story_ids[len(story_ids) // 2], since)
+
+        for phase in ("before", "after"):
+            with connection.cursor() as cursor:
+                for model in models:
+                    for index in model._meta.indexes:
+                        if phase == "before":
+                            cursor.execute(f"DROP INDEX IF EXISTS {connection.ops.quote_name(index.name)}")
+                        else:
+                            cursor.execute(str(index.create_sql(model, editor)))
+                cursor.execute("ANALYZE")
+            for name, qs in queries.items():
+                results.setdefault(name, {})[phase] = {
+                    "seconds": best_of(lambda: list(qs.all()), repeat),
+                    "plan": qs.explain(),
+                }
+        transaction.set_rollback(True)
+    return results
+
+
+# Share of the generated rows that goes to each sheet.
+SHEET_SHARES = {"sprints": 0.001, "userstories": 0.049, "testcases": 0.15, "defects": 0.3, "efforts": 0.5}
+
+
+def sheet_counts(rows):
+    return {sheet: max(int(rows * share), 1) for sheet, share in SHEET_SHARES.items()}
+
+
+def generate_workbook(path, rows, seed=0):
+    """Write a workbook of about ``rows`` rows across the five import sheets.
+
+    Stories spread over sprints, test cases over stories, and defects and
+    efforts over stories (defects also point at test cases). A few foreign
+    keys are blank or point at missing rows (the import rejects those), and
+    some optional cells are empty, as in real exports. Returns
+    ``{sheet: rows}``.
+    """
+    rng = random.Random(seed)
+    counts = sheet_counts(rows)
+    n_sprints, n_stories, n_cases = counts["sprints"], counts["userstories"], counts["testcases"]
+
+    def story_ref():
+        roll = rng.random()
+        if roll < 0.02:
+            return None
+        if roll < 0.03:
+            return n_stories + rng.randint(1, 1000)  # dangling
+        return rng.randint(1, n_stories)
+
+    def maybe(value, blank=0.1):
+        return None if rng.random() < blank else value
+
+    words = ("login checkout payment cart search profile export report filter upload "
+             "timeout crash render slow invalid missing button modal field page").split()
+
+    def text(n):
+        return " ".join(rng.choices(words, k=n))
+
+    wb = openpyxl.Workbook(write_only=True)
+    sheets = {sheet: wb.create_sheet(sheet) for sheet in SHEETS}
+    for sheet, spec in SHEETS.items():
+        sheets[sheet].append(list(spec.columns.values()))
+
+    start = date(2024, 1, 1)
+    for i in range(1, n_sprints + 1):
+        begin = start + timedelta(days=14 * (i - 1))
+        sheets["sprints"].append([i, f"Sprint {i}", begin, begin + timedelta(days=13), maybe(text(6))])
+    for i in range(1, n_stories + 1):
+        sheets["userstories"].append([
+            i, rng.randint(1, n_sprints), f"Story {i}: {text(4)}", maybe(text(20)), maybe(f"user{i % 50}"),
+            maybe(rng.choice(UserStoryStatus.values)), maybe(rng.choice([1, 2, 3, 5, 8, 13]))])
+    for i in range(1, n_cases + 1):
+        sheets["testcases"].append([i, story_ref(), f"Case {i}: {text(4)}", maybe(text(15)), maybe(f"qa{i % 20}")])
+    for i in range(1, counts["defects"] + 1):
+        sheets["defects"].append([
+            i, story_ref(), maybe(rng.randint(1, n_cases), 0.3), f"Defect {i}: {text(4)}", maybe(text(25)),
+            rng.choice(DefectStatus.values), maybe(rng.choice(DefectSeverity.values)),
+            maybe(rng.choice(DefectPriority.values)), maybe(f"qa{i % 20}"), maybe(f"dev{i % 30}")])
+    logged = datetime(2024, 1, 1, 9)
+    for i in range(1, counts["efforts"] + 1):
+        sheets["efforts"].append([
+            i, story_ref(), f"user{i % 50}", rng.choice(EffortType.values), rng.choice([0.5, 1, 1.5, 2, 4, 8]),
+            logged + timedelta(minutes=17 * i)])
+    wb.save(path)
+    return counts
+
+
+def peak_rss_mb():
+    """High-water resident set size so far of this process and its finished children, in MiB."""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / 1024  # ru_maxrss is in KiB on Linux
+
+
+@contextmanager
+def measure():
+    """Collect wall time, query count and peak RSS of the enclosed block."""
+    stats = {"queries": 0}
+
+    def count(execute, sql, params, many, context):
+        stats["queries"] += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    with connection.execute_wrapper(count):
+        yield stats
+    stats["seconds"] = time.perf_counter() - started
+    stats["peak_rss_mb"] = peak_rss_mb()
+
+
+def reset_tables():
+    """Empty every qa table with plain DELETEs, bypassing per-row signals."""
+    tables = [model._meta.db_table for model in apps.get_app_config("qa").get_models()]
+    connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables))
+    caches[CACHE_ALIAS].clear()
+
+
+def bench_import(rows=10_000, repeat=3, workbook=None, seed=0):
+    """Time both import entry points and the list views on a generated workbook.
+
+    Must run against a scratch database (``QA_BENCHMARK_DB``): every qa
+    table is emptied between runs. ``workbook`` keeps the generated file at
+    that path. Returns ``{"rows": n, "phases": {phase: stats}}`` where stats
+    hold ``seconds``, ``queries``, ``peak_rss_mb`` and, for imports,
+    ``rows_per_s``. Peak RSS is a high-water mark, so import phases run
+    first.
+    """
+    path = workbook or os.path.join(settings.MEDIA_ROOT, f"benchmark-{rows}.xlsx")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    total = sum(generate_workbook(path, rows, seed).values())
+    phases = {}
+    client = Client()
+
+    reset_tables()
+    with open(path, "rb") as f, measure() as stats:
+        response = client.post(reverse("upload_file"), {"file": f})
+        job = claim_next()
+        if job is None:
+            raise RuntimeError(f"Upload was not queued: {response.content!r}")
+        run_job(job)
+    if job.status != ImportJobStatus.DONE:
+        raise RuntimeError(f"Import failed: {job.error}")
+    phases["upload_file"] = stats
+
+    reset_tables()
+    with measure() as stats:
+        call_command("load_sample_data", "--file", path, stdout=open(os.devnull, "w"))
+    phases["load_sample_data"] = stats
+    for name in ("upload_file", "load_sample_data"):
+        phases[name]["rows_per_s"] = total / phases[name]["seconds"]
+
+    sprint_id = Sprint.objects.order_by("id").values_list("id", flat=True)[0]
+    story_id = UserStory.objects.order_by("id").values_list("id", flat=True)[0]
+    views = [
+        ("userstories", {}), ("userstories", {"sprint": sprint_id}),
+        ("defects", {}), ("defects", {"sprint": sprint_id, "status": DefectStatus.OPEN}),
+        ("testcases", {}), ("testcases", {"user_story": story_id}),
+        ("efforts", {}), ("efforts", {"user_story": story_id}),
+        ("userstories_for_sprint", {"sprint_id": sprint_id}),
+    ]
+    for name, params in views:
+        label = name + ("?" + "&".join(f"{k}={v}" for k, v in params.items()) if params else "")
+        best = None
+        for _ in range(repeat):
+            caches[CACHE_ALIAS].clear()  # time the database path, not the response cache
+            with measure() as stats:
+                client.get(reverse(name), params)
+            if best is None or stats["seconds"] < best["seconds"]:
+                best = stats
+        phases[label] = best
+    if not workbook:
+        os.remove(path)
+    return {"rows": total, "phases": phases}
+
+
+# Differences below these are noise, however large relative to the baseline.
+NOISE_FLOOR = {"seconds": 0.005, "queries": 0, "peak_rss_mb": 10}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Yield ``(phase, metric, current, baseline, regressed)`` for every metric in both runs.
+
+    Times and peak RSS regress when they exceed the baseline by more than
+    ``tolerance`` and by more than ``NOISE_FLOOR``; query counts regress on
+    any increase.
+    """
+    for phase, stats in results["phases"].items():
+        base = baseline.get("phases", {}).get(phase)
+        if base is None:
+            continue
+        for metric, floor in NOISE_FLOOR.items():
+            if metric not in base:
+                continue
+            allowed = base[metric] if metric == "queries" else base[metric] * (1 + tolerance)
+            regressed = stats[metric] > allowed and stats[metric] - base[metric] > floor
+            yield phase, metric, stats[metric], base[metric], regressed
+
+
+def load_baseline(path, rows):
+    """The run stored in ``path`` for a ``rows``-row workbook, or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f).get(str(rows))
+
+
+def save_baseline(path, results):
+    """Store ``results`` in ``path``, keeping the runs of other workbook sizes."""
+    runs = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            runs = json.load(f)
+    runs[str(results["rows"])] = results
+    with open(path, "w") as f:
+        json.dump(runs, f, indent=2, sort_keys=True)
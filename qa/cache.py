@@ -0,0 +1,181 @@
+"""Response cache for the list partials and the sprint and story pickers.
+
+An entry's key combines the view, its query string and a generation token
+for every ``(table, scope)`` the response was built from, such as
+``defect:sprint:12``, ``defect:story:5`` or ``defect:all``. A write
+deletes the tokens of the tables, stories and sprints it touched, which
+orphans exactly the entries that depended on them; the next read starts
+a new token. Tokens are unique timestamps rather than counters, so a
+deleted or evicted token can never bring an old entry back.
+
+Entries carry an ETag and requests with a matching ``If-None-Match`` get a
+304. The backend is the cache alias named by ``QA_CACHE_ALIAS``; it must be
+shared between processes, or writes by the import worker never reach the
+web server's entries (``check_shared_cache`` warns about that).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+
+from .models import Sprint, UserStory, TestCase, Defect, Effort
+
+CACHE_ALIAS = getattr(settings, "QA_CACHE_ALIAS", "default")
+CACHE_TIMEOUT = getattr(settings, "QA_CACHE_TIMEOUT", 300)
+# Backends that keep entries inside one process.
+PRIVATE_BACKENDS = ("django.core.cache.backends.locmem.LocMemCache",)
+
+# Cached tables whose responses change when a row of the model changes.
+# User stories appear in every table's sprint filter and by title in efforts.
+DEPENDENT_TABLES = {
+    Sprint: ["sprint", "userstory"],
+    UserStory: ["userstory", "defect", "testcase", "effort"],
+    TestCase: ["testcase"],
+    Defect: ["defect"],
+    Effort: ["effort"],
+}
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when the cache alias is private to each process."""
+    backend = settings.CACHES.get(CACHE_ALIAS, {}).get("BACKEND")
+    if backend not in PRIVATE_BACKENDS:
+        return []
+    return [checks.Warning(
+        f"The {CACHE_ALIAS!r} cache is local to each process, so imports run by the worker "
+        "do not invalidate the responses and references cached by the web server.",
+        hint="Configure a shared backend (file-based, database, Redis or Memcached) in CACHES.",
+        id="qa.W001",
+    )]
+
+
+def _token_keys(table, sprint_id, story_id):
+    keys = []
+    if sprint_id:
+        keys.append(f"qa:gen:{table}:sprint:{sprint_id}")
+    if story_id:
+        keys.append(f"qa:gen:{table}:story:{story_id}")
+    return keys or [f"qa:gen:{table}:all"]
+
+
+def _tokens(keys):
+    cache = _cache()
+    tokens = cache.get_many(keys)
+    for key in keys:
+        if key not in tokens:
+            cache.add(key, time.time_ns(), None)
+            tokens[key] = cache.get(key)
+    return [f"{key}={tokens[key]}" for key in keys]
+
+
+async def _atokens(keys):
+    cache = _cache()
+    tokens = await cache.aget_many(keys)
+    for key in keys:
+        if key not in tokens:
+            await cache.aadd(key, time.time_ns(), None)
+            tokens[key] = await cache.aget(key)
+    return [f"{key}={tokens[key]}" for key in keys]
+
+
+def invalidate(model, story_ids=(), sprint_ids=()):
+    """Orphan every cached response built from the given stories and sprints of ``model``."""
+    keys = []
+    for table in DEPENDENT_TABLES.get(model, []):
+        keys.append(f"qa:gen:{table}:all")
+        keys += [f"qa:gen:{table}:story:{pk}" for pk in story_ids]
+        keys += [f"qa:gen:{table}:sprint:{pk}" for pk in sprint_ids]
+    if keys:
+        # Cheaper than writing new tokens, most of which would never be read.
+        _cache().delete_many(keys)
+
+
+def generation(model):
+    """The token of ``model``'s own table; it changes with every committed write to the model."""
+    return _tokens([f"qa:gen:{model._meta.model_name}:all"])[0]
+
+
+def _entry_key(view, request, args, kwargs, tokens):
+    query = sorted((k, v) for k, values in request.GET.lists() for v in values)
+    raw = repr((view.__module__, view.__name__, args, kwargs, query, tokens))
+    return "qa:view:" + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _entry(response):
+    """The cacheable parts of a response, or None if it should not be cached."""
+    if response.status_code != 200 or response.streaming:
+        return None
+    return {
+        "content": response.content,
+        "headers": dict(response.items()),
+        "etag": quote_etag(hashlib.md5(response.content).hexdigest()),
+    }
+
+
+def _respond(request, entry):
+    if entry["etag"] in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry["content"])
+        for header, value in entry["headers"].items():
+            response[header] = value
+    response["ETag"] = entry["etag"]
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def cached_view(table, sprint_param=None, story_param=None):
+    """Cache successful GET responses of a view, sync or async.
+
+    ``sprint_param``/``story_param`` name the query parameters that scope
+    the response to one sprint or story; without them the entry depends on
+    the whole table.
+    """
+    def token_keys(request):
+        return _token_keys(table, request.GET.get(sprint_param), request.GET.get(story_param))
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != "GET":
+                    return await view(request, *args, **kwargs)
+                key = _entry_key(view, request, args, kwargs, await _atokens(token_keys(request)))
+                entry = await _cache().aget(key)
+                if entry is None:
+                    response = await view(request, *args, **kwargs)
+                    entry = _entry(response)
+                    if entry is None:
+                        return response
+                    await _cache().aset(key, entry, CACHE_TIMEOUT)
+                return _respond(request, entry)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+            key = _entry_key(view, request, args, kwargs, _tokens(token_keys(request)))
+            entry = _cache().get(key)
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                entry = _entry(response)
+                if entry is None:
+                    return response
+                _cache().set(key, entry, CACHE_TIMEOUT)
+            return _respond(request, entry)
+        return wrapper
+    return decorator
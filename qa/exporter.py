@@ -0,0 +1,168 @@
+"""Bulk export in the sheet layout ``upload_file`` reads.
+
+Every format is produced as a stream of bytes: rows come from the database
+through ``values_list().iterator()`` (server-side cursors on PostgreSQL)
+one chunk at a time and are written straight into the output, so memory
+depends on the chunk size rather than on the table sizes.
+
+* ``xlsx`` - one worksheet per sheet, written with openpyxl's write-only mode;
+  the workbook is only sent once it is complete (see ``stream_xlsx``).
+* ``csv`` - a zip holding ``<sheet>.csv`` per sheet.
+* ``parquet`` - a zip holding ``<sheet>.parquet`` per sheet; needs pyarrow.
+"""
+import csv
+import importlib.util
+import io
+import tempfile
+import zipfile
+from datetime import datetime
+
+import openpyxl
+from django.conf import settings
+from django.utils import timezone
+
+from .importer import SHEETS
+
+EXPORT_CHUNK_SIZE = getattr(settings, "QA_EXPORT_CHUNK_SIZE", 5000)
+
+# format: (file extension, content type)
+FORMATS = {
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (".zip", "application/zip"),
+    "parquet": (".zip", "application/zip"),
+}
+
+_READ_SIZE = 1024 * 1024
+
+
+class _Sink(io.RawIOBase):
+    """Unseekable write target whose contents are handed out as they arrive."""
+
+    def __init__(self):
+        super().__init__()
+        self.buf = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buf += data
+        return len(data)
+
+    def drain(self):
+        data = bytes(self.buf)
+        self.buf.clear()
+        return data
+
+
+def _cell(value):
+    """Aware datetimes are written as local wall-clock time, which is how the importer reads them."""
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+def iter_chunks(spec, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of row tuples of ``spec.model`` in ``spec.columns`` order."""
+    rows = (spec.model.objects.order_by("id")
+            .values_list(*spec.columns).iterator(chunk_size=chunk_size))
+    chunk = []
+    for row in rows:
+        chunk.append(tuple(_cell(v) for v in row))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _copy_file(fileobj):
+    fileobj.seek(0)
+    while data := fileobj.read(_READ_SIZE):
+        yield data
+
+
+def stream_xlsx(chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield an xlsx of every sheet.
+
+    Nothing is yielded until the whole workbook is written: write-only
+    worksheets spool to disk and are zipped into a temporary file on save,
+    which is then streamed out. Memory stays flat, but the response starts
+    only after every row has been read.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    for sheet, spec in SHEETS.items():
+        ws = wb.create_sheet(sheet)
+        ws.append(list(spec.columns.values()))
+        for chunk in iter_chunks(spec, chunk_size):
+            for row in chunk:
+                ws.append(row)
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        yield from _copy_file(tmp)
+
+
+def stream_csv(chunk_size=EXPORT_CHUNK_SIZE):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for sheet, spec in SHEETS.items():
+            # Sizes are not known up front on an unseekable sink; without
+            # Zip64 an entry past 2 GiB would fail when it is closed.
+            with zf.open(f"{sheet}.csv", "w", force_zip64=True) as raw:
+                text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+                writer = csv.writer(text)
+                writer.writerow(spec.columns.values())
+                for chunk in iter_chunks(spec, chunk_size):
+                    writer.writerows(chunk)
+                    text.flush()
+                    yield sink.drain()
+                text.flush()
+                text.detach()
+    yield sink.drain()
+
+
+def _arrow_schema(spec):
+    import pyarrow as pa
+
+    types = {
+        "AutoField": pa.int64(), "BigAutoField": pa.int64(), "IntegerField": pa.int64(),
+        "ForeignKey": pa.int64(), "FloatField": pa.float64(), "DateField": pa.date32(),
+        "DateTimeField": pa.timestamp("us"),
+    }
+    return pa.schema([
+        (column, types.get(spec.model._meta.get_field(attr).get_internal_type(), pa.string()))
+        for attr, column in spec.columns.items()
+    ])
+
+
+def stream_parquet(chunk_size=EXPORT_CHUNK_SIZE):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+        for sheet, spec in SHEETS.items():
+            schema = _arrow_schema(spec)
+            # Parquet writes its footer last, so each sheet is spooled to disk first.
+            with tempfile.TemporaryFile() as tmp:
+                with pq.ParquetWriter(tmp, schema) as writer:
+                    for chunk in iter_chunks(spec, chunk_size):
+                        columns = list(zip(*chunk))
+                        writer.write_table(pa.Table.from_arrays(
+                            [pa.array(col, type=f.type) for col, f in zip(columns, schema)],
+                            schema=schema))
+                with zf.open(f"{sheet}.parquet", "w", force_zip64=True) as out:
+                    for data in _copy_file(tmp):
+                        out.write(data)
+                        yield sink.drain()
+    yield sink.drain()
+
+
+def stream_export(fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the bytes of an export of every sheet in ``fmt``; raises ValueError on unknown formats."""
+    writers = {"xlsx": stream_xlsx, "csv": stream_csv, "parquet": stream_parquet}
+    if fmt not in writers:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise ValueError("Parquet export needs pyarrow to be installed")
+    return writers[fmt](chunk_size)
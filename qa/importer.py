@@ -0,0 +1,842 @@
+"""Import engine used by ``upload_file``.
+
+Sources are Excel workbooks, zip bundles of per-sheet CSV or Parquet files,
+or a single ``<sheet>.csv``/``<sheet>.parquet``; all follow the ``SHEETS``
+contract. Each sheet is converted column by column with pandas, then
+validated a column at a time (ids, required fields, choices, numbers and
+foreign keys, the latter with batched ``id__in`` queries per column), and
+model instances are built in one pass, so the number of queries no longer
+grows with row count. Rows that fail validation are left out and described
+in an ``ErrorReport`` rather than failing the import. Rows are written with
+``upsert``, one ``INSERT ... ON CONFLICT`` per batch, or on PostgreSQL with
+``copy_upsert``, which streams them through ``COPY`` into a staging table
+and merges it.
+"""
+import hashlib
+import importlib.util
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import django
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .models import Sprint, UserStory, TestCase, Defect, Effort, ImportFingerprint
+from .instrumentation import collect, timed
+from .partitions import is_partitioned
+from .refcache import existing_ids
+from .signals import rows_imported, row_scope
+
+# Use COPY + merge instead of INSERT ... ON CONFLICT on PostgreSQL.
+IMPORT_COPY = getattr(settings, "QA_IMPORT_COPY", True)
+
+
+def safe_date(val, only_date=False):
+    """Normalize Excel/Pandas date/time values into Python datetime/date or None."""
+    if val is None or pd.isna(val):
+        return None
+
+    if isinstance(val, pd.Timestamp):
+        return val.to_pydatetime().date() if only_date else val.to_pydatetime()
+
+    if isinstance(val, (np.datetime64,)):
+        dt = pd.to_datetime(val).to_pydatetime()
+        return dt.date() if only_date else dt
+
+    if isinstance(val, (int, float)):
+        try:
+            dt = pd.to_datetime(val, unit="D", origin="1899-12-30")
+            return dt.date() if only_date else dt.to_pydatetime()
+        except Exception:
+            return None
+
+    if isinstance(val, datetime):
+        return val.date() if only_date else val
+
+    if isinstance(val, str):
+        try:
+            dt = datetime.fromisoformat(val)
+            return dt.date() if only_date else dt
+        except Exception:
+            try:
+                dt = pd.to_datetime(val).to_pydatetime()
+                return dt.date() if only_date else dt
+            except Exception:
+                return None
+
+    return None
+
+
+_EXCEL_EPOCH = "1899-12-30"
+# Serials of 0001-01-01 and 10000-01-01, the span of Python datetimes.
+_SERIAL_MIN, _SERIAL_END = -693593, 2958466
+
+
+def _serials_to_datetimes(numbers):
+    """Convert Excel serial day numbers to datetimes, NaT where out of range."""
+    numbers = numbers.astype(float)
+    numbers = numbers.where((numbers >= _SERIAL_MIN) & (numbers < _SERIAL_END))
+    return pd.to_datetime(numbers, unit="D", origin=_EXCEL_EPOCH, errors="coerce")
+
+
+def _as_us(values):
+    """Truncate to microseconds, the resolution of Python datetimes."""
+    return values.dt.floor("us").astype("datetime64[us]")
+
+
+def _parse_mixed(series):
+    """Parse an object column cell type by cell type, one vectorized call per type."""
+    parsed = pd.Series(pd.NaT, index=series.index, dtype="datetime64[us]")
+    kinds = series.map(type, na_action="ignore")
+    groups = {"str": [], "datetime": [], "number": []}
+    for kind in kinds.dropna().unique():
+        if issubclass(kind, str):
+            groups["str"].append(kind)
+        elif issubclass(kind, (datetime, np.datetime64)):
+            groups["datetime"].append(kind)
+        elif issubclass(kind, (int, float, np.integer, np.floating)):
+            groups["number"].append(kind)
+
+    if groups["number"]:
+        mask = kinds.isin(groups["number"])
+        parsed[mask] = _as_us(_serials_to_datetimes(series[mask]))
+    if groups["datetime"]:
+        mask = kinds.isin(groups["datetime"])
+        parsed[mask] = _as_us(pd.to_datetime(series[mask], errors="coerce"))
+    if groups["str"]:
+        mask = kinds.isin(groups["str"])
+        strings = series[mask]
+        values = _as_us(pd.to_datetime(strings, errors="coerce", format="ISO8601"))
+        retry = values.isna()
+        if retry.any():
+            values[retry] = _as_us(pd.to_datetime(strings[retry], errors="coerce", format="mixed"))
+        parsed[mask] = values
+    return parsed
+
+
+def normalize_dates(series, only_date=False, tz=None):
+    """Column-level ``safe_date``: one vectorized pass per column.
+
+    Accepts datetime64 columns, Excel serial numbers, ISO (or otherwise
+    parseable) strings and mixed object columns. Returns an object Series of
+    Python datetimes (or dates) with None wherever ``safe_date`` gives None.
+    With ``tz``, naive datetimes are made aware in that zone. Columns mixing
+    time zones fall back to ``safe_date`` per cell.
+    """
+    try:
+        if pd.api.types.is_datetime64_any_dtype(series):
+            parsed = series
+        elif pd.api.types.is_numeric_dtype(series):
+            parsed = _serials_to_datetimes(series)
+        else:
+            parsed = _parse_mixed(series)
+        # Python datetimes end at year 9999, so later values become None, as in safe_date.
+        parsed = parsed.where(parsed.dt.year.between(1, 9999))
+        if only_date:
+            out = parsed.dt.date.astype(object)
+        else:
+            if tz is not None and parsed.dt.tz is None:
+                # Ambiguous wall times take the first offset, as make_aware does; skipped ones
+                # move to the end of the gap.
+                parsed = parsed.dt.tz_localize(tz, ambiguous=np.ones(len(parsed), dtype=bool),
+                                               nonexistent="shift_forward")
+            # pandas 3 returns a Series with a fresh RangeIndex here, pandas 2 an array.
+            out = pd.Series(np.asarray(parsed.dt.to_pydatetime(), dtype=object), index=parsed.index,
+                            dtype=object)
+    except (TypeError, ValueError, OverflowError):
+        out = series.map(lambda v: safe_date(v, only_date=only_date))
+        if tz is None or only_date:
+            return out
+        return out.map(lambda v: timezone.make_aware(v, tz) if timezone.is_naive(v) else v, na_action="ignore")
+    return out.where(parsed.notna(), None)
+
+
+@dataclass(frozen=True)
+class SheetSpec:
+    """How one workbook sheet maps onto a model.
+
+    ``columns`` maps model attribute names to sheet column names. Attributes
+    listed in ``fks`` hold foreign key ids and are checked against the
+    referenced model; rows whose ids do not exist are rejected.
+    """
+    model: type
+    columns: dict
+    fks: dict = field(default_factory=dict)
+    dates: tuple = ()
+    datetimes: tuple = ()
+
+    @property
+    def fields(self):
+        """Model fields written on update (everything except the primary key)."""
+        return [name for name in self.columns if name != "id"]
+
+
+# Ordered so that every sheet is written after the sheets it references.
+SHEETS = {
+    "sprints": SheetSpec(
+        Sprint,
+        columns={"id": "id", "name": "name", "start_date": "start_date",
+                 "end_date": "end_date", "goal": "goal"},
+        dates=("start_date", "end_date"),
+    ),
+    "userstories": SheetSpec(
+        UserStory,
+        columns={"id": "id", "sprint_id": "sprint_id", "title": "title",
+                 "description": "description", "created_by": "created_by",
+                 "status": "status", "story_points": "story_points"},
+        fks={"sprint_id": Sprint},
+    ),
+    "testcases": SheetSpec(
+        TestCase,
+        columns={"id": "id", "user_story_id": "user_story_id", "title": "title",
+                 "description": "description", "created_by": "created_by"},
+        fks={"user_story_id": UserStory},
+    ),
+    "defects": SheetSpec(
+        Defect,
+        columns={"id": "id", "user_story_id": "user_story_id", "test_case_id": "test_case_id",
+                 "title": "title", "description": "description", "status": "status",
+                 "severity": "severity", "priority": "priority",
+                 "reported_by": "reported_by", "assigned_to": "assigned_to"},
+        fks={"user_story_id": UserStory, "test_case_id": TestCase},
+    ),
+    "efforts": SheetSpec(
+        Effort,
+        columns={"id": "id", "user_story_id": "user_story_id", "user": "user_name",
+                 "effort_type": "effort_type", "hours": "hours", "logged_at": "logged_at"},
+        fks={"user_story_id": UserStory},
+        datetimes=("logged_at",),
+    ),
+}
+
+
+def _to_python(series):
+    """Turn a column into Python objects with NaN/NaT replaced by None."""
+    return series.astype(object).where(series.notna(), None)
+
+
+def _to_ids(series):
+    """Nullable integers of an id column; blank, non-numeric and fractional cells become NA."""
+    numbers = pd.to_numeric(series, errors="coerce")
+    return numbers.where((numbers % 1 == 0) & (numbers.abs() < 2 ** 63)).astype("Int64")
+
+
+def normalize_frame(spec, df):
+    """Return a DataFrame whose columns are the model attributes of ``spec``.
+
+    Sheet columns are matched after stripping surrounding whitespace; a
+    missing column becomes all-None, like ``row.get()`` did before. Blank
+    rows are dropped. Id and foreign key columns keep their sheet values,
+    so ``validate_frame`` can report the ones that are not integers.
+    """
+    df = df.rename(columns=lambda c: c.strip() if isinstance(c, str) else c).dropna(how="all")
+    if spec.columns["id"] not in df.columns:
+        raise ValueError(f"Sheet for {spec.model.__name__} has no 'id' column")
+
+    out = pd.DataFrame(index=df.index)
+    for attr, column in spec.columns.items():
+        if column not in df.columns:
+            out[attr] = None
+            continue
+        col = df[column]
+        if attr in spec.dates:
+            col = normalize_dates(col, only_date=True)
+        elif attr in spec.datetimes:
+            col = normalize_dates(col, tz=timezone.get_current_timezone() if settings.USE_TZ else None)
+        out[attr] = _to_python(col)
+    # ON CONFLICT cannot touch the same row twice in one statement.
+    ids = _to_ids(out["id"])
+    return out[~(ids.notna() & ids.duplicated(keep="last"))]
+
+
+# Columns of the frames returned by ``validate_frame`` and ``resolve_fks``.
+# ``row`` is the line in the sheet, counting the header as line 1.
+ERROR_COLUMNS = ["row", "id", "column", "value", "error"]
+
+
+def _rejections(frame, mask, column, message):
+    hit = frame[mask]
+    return pd.DataFrame({"row": hit.index + 2, "id": hit["id"], "column": column,
+                         "value": hit[column], "error": message}, columns=ERROR_COLUMNS)
+
+
+def _split(frame, problems):
+    """``(rows without problems, error frame)``; ``problems`` are ``(mask, column, message)``."""
+    bad = pd.Series(False, index=frame.index)
+    errors = []
+    for mask, column, message in problems:
+        if mask.any():
+            bad |= mask
+            errors.append(_rejections(frame, mask, column, message))
+    errors = pd.concat(errors) if errors else pd.DataFrame(columns=ERROR_COLUMNS)
+    return frame[~bad], errors
+
+
+def _required(field):
+    return not (field.null or field.has_default() or getattr(field, "auto_now_add", False))
+
+
+def validate_frame(spec, frame):
+    """Split off rows that cannot be written, checking whole columns at once.
+
+    Rows are rejected for a missing or non-integer id, a foreign key that
+    is not an integer, a missing required field, a value outside the
+    field's choices or a non-numeric number. Returns ``(valid rows,
+    errors)``; the id and foreign key columns of the valid rows are cast to
+    integers, and ``errors`` has ``ERROR_COLUMNS`` and one line per problem.
+    """
+    ids = {attr: _to_ids(frame[attr]) for attr in ("id", *spec.fks)}
+    problems = [(ids["id"].isna(), "id", "id is missing or not an integer")]
+    for attr in spec.fks:
+        problems.append((frame[attr].notna() & ids[attr].isna(), attr, f"{attr} is not an integer"))
+    for attr in spec.fields:
+        if attr in spec.fks:
+            continue
+        field = spec.model._meta.get_field(attr)
+        column = frame[attr]
+        present = column.notna()
+        if _required(field):
+            dated = attr in spec.dates or attr in spec.datetimes
+            problems.append((~present, attr, f"{attr} is missing or not a valid date" if dated
+                             else f"{attr} is required"))
+        if field.choices:
+            allowed = [value for value, _ in field.choices]
+            problems.append((present & ~column.isin(allowed), attr,
+                             f"{attr} must be one of: {', '.join(allowed)}"))
+        elif isinstance(field, (models.IntegerField, models.FloatField)):
+            numbers = pd.to_numeric(column, errors="coerce")
+            if isinstance(field, models.IntegerField):
+                problems.append((present & ~(numbers % 1 == 0), attr, f"{attr} must be a whole number"))
+            else:
+                problems.append((present & numbers.isna(), attr, f"{attr} must be a number"))
+    valid, errors = _split(frame, problems)
+    return valid.assign(**{attr: _to_python(column[valid.index]) for attr, column in ids.items()}), errors
+
+
+def resolve_fks(spec, frame):
+    """Split off rows whose foreign keys point at rows which do not exist.
+
+    Existence comes from the shared reference cache, which only queries
+    ids it has not seen, in batches of ``REFCACHE_QUERY_SIZE``.
+    Values that are not integers are left to ``validate_frame``. Returns
+    ``(rows to write, errors)`` like ``validate_frame``.
+    """
+    problems = []
+    for attr, model in spec.fks.items():
+        ids = _to_ids(frame[attr])
+        wanted = [int(pk) for pk in ids.dropna().unique()]
+        if not wanted:
+            continue
+        existing = existing_ids(model, wanted)
+        problems.append((ids.notna() & ~ids.isin(existing), attr,
+                         f"{attr} does not match any {model._meta.verbose_name}"))
+    return _split(frame, problems)
+
+
+class ErrorReport:
+    """CSV of rejected rows, one line per problem: ``sheet`` followed by ``ERROR_COLUMNS``."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.count = 0
+        pd.DataFrame(columns=["sheet", *ERROR_COLUMNS]).to_csv(fileobj, index=False)
+
+    def add(self, sheet, errors):
+        if errors.empty:
+            return
+        errors = errors.sort_values("row", kind="stable")
+        errors.insert(0, "sheet", sheet)
+        errors.to_csv(self.fileobj, header=False, index=False)
+        self.count += len(errors)
+
+
+def build_objects(spec, frame):
+    """Instantiate ``spec.model`` for every row of a normalized frame."""
+    attrs = list(frame.columns)
+    model = spec.model
+    return [model(**dict(zip(attrs, values)))
+            for values in zip(*(frame[a].tolist() for a in attrs))]
+
+
+def frame_digest(frame):
+    """Row hashes of a normalized frame as bytes, for fingerprinting a sheet."""
+    return pd.util.hash_pandas_object(frame, index=False).values.tobytes()
+
+
+def _stamped(model, fields):
+    """The ``auto_now_add`` fields among ``fields``.
+
+    A sheet value is written whenever the cell is not blank; a blank cell
+    stamps the time of the insert and leaves an existing row's value alone.
+    """
+    return [name for name in fields if getattr(model._meta.get_field(name), "auto_now_add", False)]
+
+
+def _comparable(value):
+    """Make a sheet value comparable with what the database hands back."""
+    if isinstance(value, datetime) and settings.USE_TZ and timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+def drop_unchanged(spec, frame, batch_size=1000):
+    """Split off rows that already exist with identical content.
+
+    Current values are read ``batch_size`` ids per query and compared field
+    by field; a blank ``auto_now_add`` cell matches whatever is stored.
+    Returns ``(rows to write, number of unchanged rows)``.
+    """
+    fields = spec.fields
+    stamped = [f in _stamped(spec.model, fields) for f in fields]
+    ids = frame["id"].tolist()
+    current = {}
+    for start in range(0, len(ids), batch_size):
+        current.update((row[0], row[1:]) for row in spec.model.objects.filter(
+            id__in=ids[start:start + batch_size]).values_list("id", *fields))
+
+    def changed(pk, values):
+        stored = current.get(pk)
+        return stored is None or any(
+            not (keep and value is None) and old != _comparable(value)
+            for old, value, keep in zip(stored, values, stamped))
+
+    changed = [changed(pk, values) for pk, *values in zip(ids, *(frame[f].tolist() for f in fields))]
+    return frame[changed], len(changed) - sum(changed)
+
+
+def upsert(model, objs, fields, batch_size=1000):
+    """Insert or update ``objs`` by primary key.
+
+    Every batch is a single ``INSERT ... ON CONFLICT (id) DO UPDATE`` run in
+    its own transaction. Blank ``auto_now_add`` values of existing rows are
+    filled in from the database first, so the update keeps their timestamp
+    (see ``_stamped``). Returns ``(inserted, updated)``.
+    """
+    stamped = _stamped(model, fields)
+    inserted = updated = 0
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        with transaction.atomic():
+            existing = {row[0]: row[1:] for row in model.objects.filter(id__in=[obj.id for obj in batch])
+                        .values_list("id", *stamped)}
+            for obj in batch:
+                for name, value in zip(stamped, existing.get(obj.id, ())):
+                    if getattr(obj, name) is None:
+                        setattr(obj, name, value)
+            model.objects.bulk_create(batch, update_conflicts=True, unique_fields=["id"],
+                                      update_fields=fields)
+        updated += len(existing)
+        inserted += len(batch) - len(existing)
+    return inserted, updated
+
+
+def _copy_value(value, integer=False):
+    """Encode one value for ``COPY ... FROM STDIN`` text format.
+
+    ``integer`` columns read by pandas as floats (any blank cell does that)
+    are written without the ``.0``, which PostgreSQL rejects for integers.
+    """
+    if value is None:
+        return "\\N"
+    if integer and isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return _comparable(value).isoformat()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def _is_integer(field):
+    return isinstance(field.target_field if field.is_relation else field, models.IntegerField)
+
+
+def _copy_blocks(frame, attrs, block_rows=10_000, integers=()):
+    """Yield the rows of ``frame`` as ``COPY`` text, ``block_rows`` lines at a time.
+
+    ``integers`` names the attributes of integer columns.
+    """
+    rows = zip(*(frame[a].tolist() for a in attrs))
+    flags = [a in integers for a in attrs]
+    block = []
+    for row in rows:
+        block.append("\t".join(_copy_value(v, integer) for v, integer in zip(row, flags)))
+        if len(block) >= block_rows:
+            yield "\n".join(block) + "\n"
+            block = []
+    if block:
+        yield "\n".join(block) + "\n"
+
+
+def _copy_from(cursor, sql, blocks):
+    raw = cursor.cursor
+    if hasattr(raw, "copy"):  # psycopg 3
+        with raw.copy(sql) as copy:
+            for block in blocks:
+                copy.write(block)
+    else:  # psycopg2
+        raw.copy_expert(sql, io.StringIO("".join(blocks)))
+
+
+def copy_upsert(model, frame, fields):
+    """PostgreSQL fast path for ``upsert``: ``COPY`` into a staging table, then merge.
+
+    The staging table is a temporary table dropped when the merge is done.
+    Tables with a unique index on id are merged with a single ``INSERT ...
+    ON CONFLICT (id) DO UPDATE``, which is safe against concurrent imports.
+    Partitioned tables have no such index, so their existing rows are
+    updated with ``UPDATE ... FROM`` and new ones added with ``INSERT ...
+    WHERE NOT EXISTS``, under a lock that keeps other writers out between
+    the two. As with ``upsert``, blank ``auto_now_add`` cells keep the stored
+    value or get the time of the insert. Returns ``(inserted, updated)``.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    staged = ["id"] + list(fields)
+    columns = [qn(model._meta.get_field(attr).column) for attr in staged]
+    kept = {qn(model._meta.get_field(attr).column) for attr in _stamped(model, fields)}
+    stamped = [qn(f.column) for f in model._meta.concrete_fields
+               if getattr(f, "auto_now_add", False) and qn(f.column) not in kept]
+    pk = qn(model._meta.pk.column)
+    now = timezone.now()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TEMP TABLE qa_stage ON COMMIT DROP AS "
+                       f"SELECT {', '.join(columns)} FROM {table} WITH NO DATA")
+        _copy_from(cursor, f"COPY qa_stage ({', '.join(columns)}) FROM STDIN",
+                   _copy_blocks(frame, staged,
+                                integers={a for a in staged if _is_integer(model._meta.get_field(a))}))
+        if is_partitioned(model):
+            inserted, updated = _merge_locked(cursor, table, pk, columns, kept, stamped, now)
+        else:
+            inserted, updated = _merge_on_conflict(cursor, table, pk, columns, kept, stamped, now)
+        # ON COMMIT DROP alone would leave it behind inside an enclosing transaction.
+        cursor.execute("DROP TABLE pg_temp.qa_stage")
+    return inserted, updated
+
+
+def _merge_on_conflict(cursor, table, pk, columns, kept, stamped, now):
+    # A blank kept cell takes the stored value, read in the same statement.
+    selected = [f"COALESCE(s.{c}, t.{c}, %s)" if c in kept else f"s.{c}" for c in columns] + ["%s"] * len(stamped)
+    if len(columns) > 1:
+        action = "UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in columns[1:])
+    else:
+        action = "NOTHING"
+    # xmax is 0 only for rows this statement inserted.
+    cursor.execute(
+        f"WITH merged AS (INSERT INTO {table} ({', '.join(columns + stamped)}) "
+        f"SELECT {', '.join(selected)} FROM qa_stage AS s LEFT JOIN {table} AS t ON t.{pk} = s.{pk} "
+        f"ON CONFLICT ({pk}) DO {action} RETURNING xmax = 0 AS inserted) "
+        f"SELECT count(*) FILTER (WHERE inserted), (SELECT count(*) FROM qa_stage) FROM merged",
+        [now] * (len(kept) + len(stamped)),
+    )
+    inserted, total = cursor.fetchone()
+    return inserted, total - inserted
+
+
+def _merge_locked(cursor, table, pk, columns, kept, stamped, now):
+    # Blocks other writers, but not readers, until the transaction ends.
+    cursor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+    if len(columns) > 1:
+        assignments = ", ".join(f"{c} = COALESCE(s.{c}, t.{c})" if c in kept else f"{c} = s.{c}"
+                                for c in columns[1:])
+        cursor.execute(f"UPDATE {table} AS t SET {assignments} "
+                       f"FROM qa_stage AS s WHERE t.{pk} = s.{pk}")
+    else:
+        cursor.execute(f"SELECT 1 FROM {table} AS t JOIN qa_stage AS s ON t.{pk} = s.{pk}")
+    updated = cursor.rowcount
+
+    selected = [f"COALESCE(s.{c}, %s)" if c in kept else f"s.{c}" for c in columns] + ["%s"] * len(stamped)
+    cursor.execute(
+        f"INSERT INTO {table} ({', '.join(columns + stamped)}) "
+        f"SELECT {', '.join(selected)} "
+        f"FROM qa_stage AS s WHERE NOT EXISTS "
+        f"(SELECT 1 FROM {table} AS t WHERE t.{pk} = s.{pk})",
+        [now] * (len(kept) + len(stamped)),
+    )
+    return cursor.rowcount, updated
+
+
+def write_frame(spec, frame, batch_size=1000):
+    """Upsert a resolved frame and announce it through ``rows_imported``.
+
+    Returns ``(inserted, updated)``.
+    """
+    if frame.empty:
+        return 0, 0
+    model = spec.model
+    ids = frame["id"].tolist()
+    track = rows_imported.has_listeners(model)
+    if track:
+        story_ids, sprint_ids = row_scope(model, ids, batch_size)
+    # Partitioned tables have no unique index on id for ON CONFLICT to use.
+    if connection.vendor == "postgresql" and (IMPORT_COPY or is_partitioned(model)):
+        inserted, updated = copy_upsert(model, frame, spec.fields)
+    else:
+        inserted, updated = upsert(model, build_objects(spec, frame), spec.fields, batch_size=batch_size)
+    if track:
+        after_stories, after_sprints = row_scope(model, ids, batch_size)
+        rows_imported.send(sender=model, ids=ids, story_ids=story_ids | after_stories,
+                           sprint_ids=sprint_ids | after_sprints)
+    return inserted, updated
+
+
+def iter_sheet_chunks(worksheet, chunk_rows):
+    """Yield DataFrames of at most ``chunk_rows`` rows from a read-only worksheet.
+
+    The first row is the header. Only one chunk is held in memory at a time.
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    width = len(header)
+    buf = []
+    for row in rows:
+        row = tuple(row[:width])
+        buf.append(row + (None,) * (width - len(row)))
+        if len(buf) >= chunk_rows:
+            yield pd.DataFrame.from_records(buf, columns=header)
+            buf = []
+    if buf:
+        yield pd.DataFrame.from_records(buf, columns=header)
+
+
+def source_format(source):
+    """``"xlsx"``, ``"zip"``, ``"csv"`` or ``"parquet"``, from the file name of ``source``.
+
+    File objects without a recognisable name are taken to be workbooks.
+    """
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", None) or ""
+    ext = os.path.splitext(str(name))[1].lower().lstrip(".")
+    return ext if ext in ("zip", "csv", "parquet") else "xlsx"
+
+
+def _parquet_chunks(fileobj, chunk_rows):
+    if importlib.util.find_spec("pyarrow") is None:
+        raise ValueError("Parquet import needs pyarrow to be installed")
+    if not chunk_rows:
+        yield pd.read_parquet(fileobj)
+        return
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(fileobj).iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+
+def _csv_chunks(fileobj, chunk_rows):
+    if not chunk_rows:
+        yield pd.read_csv(fileobj)
+        return
+    yield from pd.read_csv(fileobj, chunksize=chunk_rows)
+
+
+def normalized(spec, chunks):
+    """Normalize raw chunks lazily, timing reading as ``parse`` and conversion as ``normalize``."""
+    chunks = iter(chunks)
+    offset = 0
+    while True:
+        with timed("parse"):
+            df = next(chunks, None)
+        if df is None:
+            return
+        # Number rows across chunks, so errors can point at sheet lines.
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        offset += len(df)
+        with timed("normalize"):
+            frame = normalize_frame(spec, df)
+        yield frame
+
+
+def _columnar_chunks(fileobj, fmt, chunk_rows):
+    return _csv_chunks(fileobj, chunk_rows) if fmt == "csv" else _parquet_chunks(fileobj, chunk_rows)
+
+
+def read_bundle(source, chunk_rows=None):
+    """``read_sheets`` for a zip holding ``<sheet>.csv`` or ``<sheet>.parquet`` members."""
+    with zipfile.ZipFile(source) as zf:
+        members = {}
+        for name in zf.namelist():
+            stem, ext = os.path.splitext(os.path.basename(name))
+            if stem in SHEETS and ext.lower() in (".csv", ".parquet"):
+                members[stem] = (name, ext.lower().lstrip("."))
+        for sheet, spec in SHEETS.items():
+            if sheet in members:
+                name, fmt = members[sheet]
+                with zf.open(name) as fh:
+                    # Parquet needs random access to read its footer.
+                    data = io.BytesIO(fh.read()) if fmt == "parquet" else fh
+                    yield sheet, normalized(spec, _columnar_chunks(data, fmt, chunk_rows))
+
+
+def read_single(source, fmt, chunk_rows=None):
+    """``read_sheets`` for one ``<sheet>.csv`` or ``<sheet>.parquet`` file."""
+    name = source if isinstance(source, (str, os.PathLike)) else source.name
+    sheet = os.path.splitext(os.path.basename(str(name)))[0]
+    if sheet not in SHEETS:
+        raise ValueError(f"{os.path.basename(str(name))} is not named after a sheet ({', '.join(SHEETS)})")
+    yield sheet, normalized(SHEETS[sheet], _columnar_chunks(source, fmt, chunk_rows))
+
+
+def read_sheets(source, chunk_rows=None):
+    """Yield ``(sheet, frames)`` for every known sheet in ``source``, in ``SHEETS`` order.
+
+    ``source`` is a path or file object and ``frames`` yields normalized
+    DataFrames. Without ``chunk_rows`` each sheet is parsed whole by pandas;
+    with it rows are streamed in chunks (workbooks are opened read-only),
+    so memory depends on the chunk size rather than on the source size.
+    ``frames`` must be consumed before the next sheet.
+    """
+    fmt = source_format(source)
+    if fmt == "zip":
+        yield from read_bundle(source, chunk_rows)
+        return
+    if fmt != "xlsx":
+        yield from read_single(source, fmt, chunk_rows)
+        return
+
+    if not chunk_rows:
+        xl = pd.ExcelFile(source)
+        for sheet, spec in SHEETS.items():
+            if sheet in xl.sheet_names:
+                yield sheet, normalized(spec, map(xl.parse, [sheet]))
+        return
+
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        for sheet, spec in SHEETS.items():
+            if sheet in wb.sheetnames:
+                yield sheet, normalized(spec, iter_sheet_chunks(wb[sheet], chunk_rows))
+    finally:
+        wb.close()
+
+
+def parse_sheet(path, sheet):
+    """Read and normalize one sheet. Runs in a worker process, so it must not touch the database."""
+    return normalize_frame(SHEETS[sheet], pd.read_excel(path, sheet_name=sheet))
+
+
+def _parsed(future):
+    # Parsing and normalizing both happened in the worker; waiting for it counts as parse time.
+    with timed("parse"):
+        frame = future.result()
+    yield frame
+
+
+def read_sheets_parallel(path, jobs):
+    """Like ``read_sheets`` but parses every sheet at the same time on a process pool.
+
+    Sheets are still yielded in ``SHEETS`` order, so each one can be written
+    as soon as it and the sheets it references are ready.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True)
+    sheets = [sheet for sheet in SHEETS if sheet in wb.sheetnames]
+    wb.close()
+    if not sheets:
+        return
+
+    executor = ProcessPoolExecutor(max_workers=min(jobs, len(sheets)), initializer=django.setup)
+    try:
+        futures = {sheet: executor.submit(parse_sheet, path, sheet) for sheet in sheets}
+        for sheet in sheets:
+            yield sheet, _parsed(futures[sheet])
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def import_sheet(spec, sheet, frames, counts, batch_size, chunk_rows, progress, incremental, fingerprint,
+                 errors=None):
+    """Write the frames of one sheet, updating ``counts``; see ``import_workbook``."""
+    parsed = 0
+    hasher = hashlib.sha256()
+    if progress:
+        progress(sheet, 0, 0)
+    for frame in frames:
+        parsed += len(frame)
+        # Both checks see every row, so the report lists all of a row's problems.
+        with timed("validate"):
+            valid, invalid = validate_frame(spec, frame)
+        with timed("fk"):
+            resolved, dangling = resolve_fks(spec, frame)
+        frame = valid[valid.index.isin(resolved.index)]
+        rejected = [e for e in (invalid, dangling) if not e.empty]
+        if rejected:
+            rejected = pd.concat(rejected)
+            counts["invalid"] += rejected["row"].nunique()
+            if errors is not None:
+                errors.add(sheet, rejected)
+        if incremental:
+            with timed("diff"):
+                hasher.update(frame_digest(frame))
+                if not chunk_rows and hasher.hexdigest() == fingerprint:
+                    counts["skipped"] += len(frame)
+                    continue
+                frame, skipped = drop_unchanged(spec, frame, batch_size)
+            counts["skipped"] += skipped
+        with timed("write"):
+            inserted, updated = write_frame(spec, frame, batch_size)
+        counts["inserted"] += inserted
+        counts["updated"] += updated
+        if progress:
+            progress(sheet, parsed, counts["inserted"] + counts["updated"])
+    if incremental:
+        ImportFingerprint.objects.update_or_create(sheet=sheet, defaults={"digest": hasher.hexdigest()})
+    if progress:
+        progress(sheet, parsed, counts["inserted"] + counts["updated"])
+
+
+def import_workbook(source, batch_size=1000, chunk_rows=None, progress=None, jobs=1,
+                    incremental=False, errors=None):
+    """Import every known sheet of a workbook or CSV/Parquet source in dependency order.
+
+    See ``read_sheets`` for ``chunk_rows``. With ``jobs`` > 1 and no
+    ``chunk_rows``, a workbook ``source`` must be a path and its sheets are
+    parsed in parallel by ``read_sheets_parallel`` (columnar sources are
+    cheap enough to read in turn); writes still happen one sheet at a
+    time in ``SHEETS`` order. ``progress``, if given, is called as
+    ``progress(sheet, parsed, written)`` with running row totals when a sheet
+    starts and after every chunk.
+
+    With ``incremental``, rows identical to the database are not written,
+    and a whole sheet is skipped when its fingerprint matches the last
+    incremental import of that sheet (streamed sheets are always diffed row
+    by row). Saves, deletes and imports drop the fingerprint, but
+    ``QuerySet.update()`` and raw SQL do not: after those, the sheet is
+    still skipped until a plain import or another write drops it.
+
+    Rows that fail ``validate_frame`` or ``resolve_fks`` are not written and
+    are counted as ``invalid``; ``errors``, if given, is an ``ErrorReport``
+    that receives them. Returns ``{sheet: {"inserted": n, "updated": m,
+    "skipped": k, "invalid": i, "timings": {phase: seconds}}}`` for the
+    sheets found, where the phases are ``parse``, ``normalize``,
+    ``validate``, ``fk``, ``diff`` (incremental only) and ``write``.
+    """
+    if jobs > 1 and not chunk_rows and source_format(source) == "xlsx":
+        sheets = read_sheets_parallel(source, jobs)
+    else:
+        sheets = read_sheets(source, chunk_rows)
+    fingerprints = dict(ImportFingerprint.objects.values_list("sheet", "digest")) if incremental else {}
+
+    stats = {}
+    sheets = iter(sheets)
+    while True:
+        with collect() as timings:
+            # Opening the source happens on the first step, so it counts as parse time too.
+            with timed("parse"):
+                entry = next(sheets, None)
+            if entry is None:
+                break
+            sheet, frames = entry
+            counts = stats[sheet] = {"inserted": 0, "updated": 0, "skipped": 0, "invalid": 0}
+            import_sheet(SHEETS[sheet], sheet, frames, counts, batch_size, chunk_rows, progress,
+                         incremental, fingerprints.get(sheet), errors)
+        counts["timings"] = {name: round(seconds, 4) for name, seconds in timings.items()}
+    return stats
@@ -0,0 +1,195 @@
+"""Opt-in request instrumentation and import phase timings.
+
+With ``QA_INSTRUMENTATION = True``, ``InstrumentationMiddleware`` records
+for every request the query count, total database time, repeated
+statements (the N+1 signature), time spent in blocks wrapped in ``timed``
+(template rendering, for instance) and the slowest statements. The numbers
+go out in a ``Server-Timing`` header and the last
+``QA_INSTRUMENTATION_HISTORY`` requests are kept in a bounded deque served
+by the ``/instrumentation/`` endpoint to local clients. Nothing is stored
+in ``connection.queries``, so memory stays flat with ``DEBUG`` off.
+
+The middleware runs sync or async. Async views run their queries on
+worker threads with their own connections, so the recorder is found
+through a context variable by a wrapper installed on every connection
+rather than attached to the connections of the request's thread.
+
+``timed`` and ``collect`` are also used by the import engine to break each
+sheet down into parse, normalize, FK resolution and write time.
+"""
+import heapq
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+INSTRUMENTATION = getattr(settings, "QA_INSTRUMENTATION", False)
+HISTORY_SIZE = getattr(settings, "QA_INSTRUMENTATION_HISTORY", 200)
+SLOWEST_QUERIES = 5
+SQL_PREVIEW = 300
+
+_timings = ContextVar("qa_timings", default=None)
+_recorder = ContextVar("qa_recorder", default=None)
+history = deque(maxlen=HISTORY_SIZE)
+
+
+@contextmanager
+def collect():
+    """Gather the ``timed`` blocks run inside into a ``{name: seconds}`` dict."""
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the duration of the block to ``name`` in the innermost ``collect``; free when none is active."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that times statements and keeps only the slowest few."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            self.statements[sql] = self.statements.get(sql, 0) + 1
+            entry = (elapsed, self.count, sql[:SQL_PREVIEW])
+            if len(self.slowest) < SLOWEST_QUERIES:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    @property
+    def repeated(self):
+        """Statements run more than once with the same SQL, beyond their first run."""
+        return self.count - len(self.statements)
+
+
+def _record(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(connection, **kwargs):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+def _install_on_open_connections():
+    # Connections opened before the middleware was loaded missed the signal.
+    for connection in connections.all(initialized_only=True):
+        install_recorder(connection)
+
+
+def server_timing(summary):
+    parts = [f'db;dur={summary["db_ms"]:.1f};desc="{summary["queries"]} queries"']
+    parts += [f"{name};dur={ms:.1f}" for name, ms in summary["timings_ms"].items()]
+    parts.append(f'total;dur={summary["total_ms"]:.1f}')
+    return ", ".join(parts)
+
+
+class InstrumentationMiddleware:
+    """Time each request's SQL and ``timed`` blocks; see the module docstring."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        connection_created.connect(install_recorder)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        _install_on_open_connections()
+        with self.recording(request) as finish:
+            return finish(self.get_response(request))
+
+    async def __acall__(self, request):
+        # On the thread the async ORM will use for this request.
+        await sync_to_async(_install_on_open_connections)()
+        with self.recording(request) as finish:
+            return finish(await self.get_response(request))
+
+    @contextmanager
+    def recording(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        token = _recorder.set(recorder)
+        try:
+            with collect() as timings:
+                yield lambda response: self.finish(request, response, recorder, timings, started)
+        finally:
+            _recorder.reset(token)
+
+    def finish(self, request, response, recorder, timings, started):
+        summary = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": (time.perf_counter() - started) * 1000,
+            "db_ms": recorder.seconds * 1000,
+            "queries": recorder.count,
+            "repeated_queries": recorder.repeated,
+            "timings_ms": {name: seconds * 1000 for name, seconds in timings.items()},
+            "slowest": [{"ms": elapsed * 1000, "sql": sql}
+                        for elapsed, _, sql in sorted(recorder.slowest, reverse=True)],
+        }
+        response["Server-Timing"] = server_timing(summary)
+        if not request.path.startswith("/instrumentation/"):
+            history.append(summary)
+        return response
+
+
+def report():
+    """The recorded requests, newest first, plus per-path averages."""
+    recent = list(history)
+    paths = {}
+    for entry in recent:
+        agg = paths.setdefault(entry["path"], {"requests": 0, "total_ms": 0.0, "db_ms": 0.0, "queries": 0})
+        agg["requests"] += 1
+        agg["total_ms"] += entry["total_ms"]
+        agg["db_ms"] += entry["db_ms"]
+        agg["queries"] += entry["queries"]
+    averages = {path: {"requests": agg["requests"],
+                       "avg_total_ms": agg["total_ms"] / agg["requests"],
+                       "avg_db_ms": agg["db_ms"] / agg["requests"],
+                       "avg_queries": agg["queries"] / agg["requests"]}
+                for path, agg in paths.items()}
+    return {"paths": averages, "requests": recent[::-1]}
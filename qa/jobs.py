@@ -0,0 +1,102 @@
+"""Background import jobs.
+
+``upload_file`` saves the workbook and queues an ``ImportJob``. The
+``run_import_worker`` management command claims queued jobs straight from
+the database and runs them, so no message broker is needed and several
+workers can run side by side. Rows that fail validation are skipped and
+kept in the job's ``error_report`` CSV.
+"""
+import io
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .importer import SHEETS, ErrorReport, import_workbook
+from .models import ImportJob, ImportJobStatus
+
+IMPORT_BATCH_SIZE = getattr(settings, "QA_IMPORT_BATCH_SIZE", 1000)
+# Workbooks larger than this many bytes are streamed in chunks of IMPORT_CHUNK_ROWS rows.
+IMPORT_STREAM_THRESHOLD = getattr(settings, "QA_IMPORT_STREAM_THRESHOLD", 20 * 1024 * 1024)
+IMPORT_CHUNK_ROWS = getattr(settings, "QA_IMPORT_CHUNK_ROWS", 5000)
+# Worker processes used to parse sheets of non-streamed workbooks in parallel.
+IMPORT_JOBS = getattr(settings, "QA_IMPORT_JOBS", min(len(SHEETS), os.cpu_count() or 1))
+
+
+def enqueue(upload, incremental=False):
+    """Store an uploaded workbook and queue it for import."""
+    return ImportJob.objects.create(file=upload, incremental=incremental)
+
+
+def claim_next():
+    """Mark the oldest queued job as running and return it, or None.
+
+    Rows locked by another worker are skipped on databases that support it;
+    the conditional update keeps two workers from claiming the same job
+    elsewhere.
+    """
+    with transaction.atomic():
+        job = (ImportJob.objects.select_for_update(skip_locked=True)
+               .filter(status=ImportJobStatus.QUEUED).order_by("id").first())
+        if job is None:
+            return None
+        claimed = (ImportJob.objects.filter(pk=job.pk, status=ImportJobStatus.QUEUED)
+                   .update(status=ImportJobStatus.RUNNING, started_at=timezone.now()))
+    if not claimed:
+        return claim_next()
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale(older_than):
+    """Queue again the jobs that have been running for longer than ``older_than``.
+
+    A worker that dies mid-import leaves its job running for good; the
+    upload is only deleted once a job finishes, so it can simply run again.
+    Returns the number of jobs requeued.
+    """
+    cutoff = timezone.now() - older_than
+    return (ImportJob.objects.filter(status=ImportJobStatus.RUNNING, started_at__lt=cutoff)
+            .update(status=ImportJobStatus.QUEUED, started_at=None, progress={}))
+
+
+def run_job(job):
+    """Import the workbook of a claimed job, recording progress as it goes."""
+    progress = {}
+
+    def report(sheet, parsed, written):
+        entry = progress.setdefault(sheet, {"parsed": 0, "written": 0, "errors": []})
+        entry.update(parsed=parsed, written=written)
+        ImportJob.objects.filter(pk=job.pk).update(progress=progress)
+
+    with tempfile.TemporaryFile() as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        errors = ErrorReport(text)
+        try:
+            chunk_rows = IMPORT_CHUNK_ROWS if job.file.size > IMPORT_STREAM_THRESHOLD else None
+            stats = import_workbook(job.file.path, batch_size=IMPORT_BATCH_SIZE, chunk_rows=chunk_rows,
+                                    progress=report, jobs=IMPORT_JOBS, incremental=job.incremental,
+                                    errors=errors)
+        except Exception as e:
+            if progress:
+                progress[next(reversed(progress))]["errors"].append(str(e))
+            job.status = ImportJobStatus.FAILED
+            job.error = str(e)
+        else:
+            for sheet, counts in stats.items():
+                progress[sheet].update(counts)
+            job.status = ImportJobStatus.DONE
+            job.file.delete(save=False)
+        # Rows rejected before a failure are reported too.
+        text.detach()
+        if errors.count:
+            raw.seek(0)
+            job.error_report.save(f"import-{job.pk}-errors.csv", File(raw), save=False)
+
+    job.progress = progress
+    job.finished_at = timezone.now()
+    job.save()
+    return job
@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from qa.benchmarks import (bench_dates, bench_import, bench_indexes, compare, load_baseline,
+                           save_baseline)
+
+
+class Command(BaseCommand):
+    help = "Run import engine and list view benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "suite",
+            choices=["dates", "indexes", "import"],
+            help="Benchmark to run",
+        )
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=None,
+            help="Rows per generated column (dates, default 100k), defects to seed (indexes, default 1M) "
+                 "or rows in the generated workbook (import, default 10k)",
+        )
+        parser.add_argument(
+            "--plans",
+            action="store_true",
+            help="Print query plans (indexes)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Runs per measurement; the fastest is reported",
+        )
+        parser.add_argument(
+            "--baseline",
+            type=str,
+            default="benchmark_baseline.json",
+            help="Baselines to compare the import suite against, one per workbook size",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Store this import run as the new baseline for its workbook size",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed slowdown over the baseline before a timing counts as a regression",
+        )
+        parser.add_argument(
+            "--workbook",
+            type=str,
+            default=None,
+            help="Keep the generated workbook at this path (import)",
+        )
+
+    def handle(self, *args, **options):
+        getattr(self, f"run_{options['suite']}")(options)
+
+    def run_dates(self, options):
+        rows = options["rows"] or 100_000
+        self.stdout.write(self.style.NOTICE(f"Date normalization, {rows:,} rows per column"))
+        self.stdout.write(f"{'column':<14}{'safe_date':>12}{'vectorized':>12}{'speedup':>10}  same")
+        for r in bench_dates(rows, options["repeat"]):
+            line = (f"{r['column']:<14}{r['safe_date']:>11.3f}s{r['normalize_dates']:>11.3f}s"
+                    f"{r['speedup']:>9.1f}x  {'yes' if r['same'] else 'NO'}")
+            self.stdout.write(self.style.SUCCESS(line) if r["same"] else self.style.ERROR(line))
+
+    def use_scratch_db(self, why):
+        if not getattr(settings, "QA_BENCHMARK_DB", False):
+            raise CommandError(f"{why}; run it with --settings=qa_portal.settings_bench")
+        call_command("migrate", run_syncdb=True, verbosity=0)
+
+    def run_indexes(self, options):
+        self.use_scratch_db("The indexes suite drops the qa indexes and seeds rows into the qa tables")
+        rows = options["rows"] or 1_000_000
+        self.stdout.write(self.style.NOTICE(
+            f"List view queries at {rows:,} defects, without and with indexes (data is rolled back)"))
+        self.stdout.write(f"{'query':<26}{'before':>11}{'after':>11}{'speedup':>10}")
+        for name, phases in bench_indexes(rows, options["repeat"]).items():
+            before, after = phases["before"]["seconds"], phases["after"]["seconds"]
+            speedup = before / after if after else float("inf")
+            self.stdout.write(f"{name:<26}{before * 1000:>9.2f}ms{after * 1000:>9.2f}ms{speedup:>9.1f}x")
+            if options["plans"]:
+                for phase in ("before", "after"):
+                    self.stdout.write(f"  {phase}:")
+                    for line in phases[phase]["plan"].splitlines():
+                        self.stdout.write(f"    {line}")
+
+    def run_import(self, options):
+        self.use_scratch_db("The import suite empties every qa table")
+        rows = options["rows"] or 10_000
+        self.stdout.write(self.style.NOTICE(f"Import and list views, {rows:,}-row generated workbook"))
+        results = bench_import(rows, options["repeat"], workbook=options["workbook"])
+
+        baseline = load_baseline(options["baseline"], results["rows"]) or {}
+        if not baseline:
+            self.stdout.write(self.style.WARNING(
+                f"No {results['rows']:,}-row baseline in {options['baseline']}; not comparing"))
+        deltas = {(phase, metric): (base, regressed) for phase, metric, _, base, regressed
+                  in compare(results, baseline, options["tolerance"])}
+
+        self.stdout.write(f"{'phase':<44}{'time':>10}{'queries':>9}{'peak RSS':>11}{'rows/s':>11}")
+        regressions = 0
+        for phase, stats in results["phases"].items():
+            rate = f"{stats['rows_per_s']:,.0f}" if "rows_per_s" in stats else "-"
+            line = (f"{phase:<44}{stats['seconds'] * 1000:>8.1f}ms{stats['queries']:>9}"
+                    f"{stats['peak_rss_mb']:>8.0f}MiB{rate:>11}")
+            flagged = [metric for (p, metric), (_, regressed) in deltas.items() if p == phase and regressed]
+            regressions += len(flagged)
+            if flagged:
+                notes = ", ".join(f"{m} was {deltas[(phase, m)][0]:.4g}" for m in flagged)
+                self.stdout.write(self.style.ERROR(f"{line}  regressed: {notes}"))
+            else:
+                self.stdout.write(line)
+
+        if options["save_baseline"]:
+            save_baseline(options["baseline"], results)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+        elif baseline:
+            summary = f"{regressions} regression(s) against {options['baseline']}"
+            self.stdout.write(self.style.ERROR(summary) if regressions else self.style.SUCCESS(summary))
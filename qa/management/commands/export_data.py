@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from qa.exporter import EXPORT_CHUNK_SIZE, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Export every sheet in the layout upload_file reads (xlsx, zipped CSV or zipped Parquet)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=list(FORMATS),
+            default="xlsx",
+            help="Output format",
+        )
+        parser.add_argument(
+            "--file",
+            type=str,
+            default=None,
+            help="Output path (default: qualitrack-export.xlsx or .zip)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help="Rows fetched from the database per round trip",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["format"]
+        path = options["file"] or f"qualitrack-export{FORMATS[fmt][0]}"
+
+        started = time.perf_counter()
+        try:
+            content = stream_export(fmt, options["chunk_size"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        size = 0
+        with open(path, "wb") as out:
+            for data in content:
+                out.write(data)
+                size += len(data)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {fmt} to {path} ({size / 1024:,.0f} KiB in {elapsed:.2f}s)"))
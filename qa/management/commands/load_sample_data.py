@@ -1,130 +1,91 @@
-import pandas as pd
+import time
+
 from django.core.management.base import BaseCommand
-from qa.models import Sprint, UserStory, Defect, TestCase, Effort
+from qa.importer import ErrorReport, import_workbook
+
 
 class Command(BaseCommand):
-    help = "Load sample data from Test Sample Data.xlsx into the database"
+    help = "Load sample data from TestSampleData.xlsx (or a CSV/Parquet export) into the database"
 
     def add_arguments(self, parser):
         parser.add_argument(
             "--file",
             type=str,
             default="TestSampleData.xlsx",
-            help="Path to the Excel file",
+            help="Path to the workbook, CSV/Parquet zip bundle or single <sheet>.csv/.parquet file",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows written per INSERT statement and transaction",
+        )
+        parser.add_argument(
+            "--chunk-rows",
+            type=int,
+            default=None,
+            help="Stream the workbook in chunks of this many rows instead of parsing whole sheets",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=1,
+            help="Worker processes used to parse sheets in parallel (ignored with --chunk-rows)",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only write rows that are new or changed since the last import. A sheet identical to the "
+                 "last incremental import is skipped without reading the table, so run a plain import after "
+                 "changing rows with QuerySet.update() or raw SQL",
+        )
+        parser.add_argument(
+            "--errors",
+            type=str,
+            default=None,
+            help="Write rows that fail validation, with the reason, to this CSV file",
         )
 
     def handle(self, *args, **options):
         file_path = options["file"]
 
-        self.stdout.write(self.style.NOTICE(f"Reading Excel file: {file_path}"))
-
-        # ---- Load Sprints ----
-        try:
-            df_sprints = pd.read_excel(file_path, sheet_name="sprints")
-            for _, row in df_sprints.iterrows():
-                Sprint.objects.get_or_create(
-                    id=row.get("ID"),
-                    defaults={
-                        "name": row.get("name"),
-                        "start_date": row.get("start_date"),
-                        "end_date": row.get("end_date"),
-                        "goal": row.get("goal"),
-                    },
-                )
-            self.stdout.write(self.style.SUCCESS("Loaded Sprints"))
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f"No Sprints sheet found ({e})"))
+        self.stdout.write(self.style.NOTICE(f"Reading {file_path}"))
 
-        # ---- Load User Stories ----
+        errors_file = open(options["errors"], "w", newline="", encoding="utf-8") if options["errors"] else None
+        started = time.perf_counter()
         try:
-            df_stories = pd.read_excel(file_path, sheet_name="userstories")
-            for _, row in df_stories.iterrows():
-                sprint = None
-                if not pd.isna(row.get("sprint_id")):
-                    sprint = Sprint.objects.filter(id=int(row["sprint_id"])).first()
-
-                UserStory.objects.get_or_create(
-                    id=row.get("ID"),
-                    defaults={
-                        "sprint": sprint,
-                        "title": row.get("title"),
-                        "description": row.get("description"),
-                        "created_by": row.get("created_by"),
-                        "status": row.get("status"),
-                        "story_points": row.get("story_points"),
-                    },
-                )
-            self.stdout.write(self.style.SUCCESS("Loaded User Stories"))
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f"No UserStories sheet found ({e})"))
+            stats = import_workbook(
+                file_path,
+                batch_size=options["batch_size"],
+                chunk_rows=options["chunk_rows"],
+                jobs=options["jobs"],
+                incremental=options["incremental"],
+                errors=ErrorReport(errors_file) if errors_file else None,
+            )
+        finally:
+            if errors_file:
+                errors_file.close()
+        elapsed = time.perf_counter() - started
 
-        # ---- Load Test Cases ----
-        try:
-            df_tc = pd.read_excel(file_path, sheet_name="testcases")
-            for _, row in df_tc.iterrows():
-                story = None
-                if not pd.isna(row.get("userstory_id")):
-                    story = UserStory.objects.filter(id=int(row["userstory_id"])).first()
+        total = 0
+        for sheet, counts in stats.items():
+            total += counts["inserted"] + counts["updated"] + counts["skipped"]
+            self.stdout.write(self.style.SUCCESS(
+                f"Loaded {sheet}: {counts['inserted']} inserted, {counts['updated']} updated, "
+                f"{counts['skipped']} unchanged"))
+            if counts["invalid"]:
+                self.stdout.write(self.style.WARNING(f"    {counts['invalid']} rows rejected"))
+            if options["verbosity"] > 1:
+                self.stdout.write("    " + ", ".join(
+                    f"{phase} {seconds:.3f}s" for phase, seconds in counts["timings"].items()))
+        if not stats:
+            self.stdout.write(self.style.WARNING("No known sheets found"))
 
-                TestCase.objects.get_or_create(
-                    id=row.get("ID"),
-                    defaults={
-                        "user_story": story,
-                        "title": row.get("title"),
-                        "description": row.get("description"),
-                        "created_by": row.get("created_by"),
-                    },
-                )
-            self.stdout.write(self.style.SUCCESS("Loaded Test Cases"))
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f"No TestCases sheet found ({e})"))
-
-        # ---- Load Defects ----
-        try:
-            df_defects = pd.read_excel(file_path, sheet_name="defects")
-            for _, row in df_defects.iterrows():
-                story = None
-                if not pd.isna(row.get("userstory_id")):
-                    story = UserStory.objects.filter(id=int(row["userstory_id"])).first()
-                test_case = None
-                if not pd.isna(row.get("testcase_id")):
-                    test_case = TestCase.objects.filter(id=int(row["testcase_id"])).first()
-
-                Defect.objects.get_or_create(
-                    id=row.get("ID"),
-                    defaults={
-                        "user_story": story,
-                        "test_case": test_case,
-                        "title": row.get("title"),
-                        "description": row.get("description"),
-                        "status": row.get("status"),
-                        "severity": row.get("severity"),
-                        "priority": row.get("priority"),
-                        "reported_by": row.get("reported_by"),
-                        "assigned_to": row.get("assigned_to"),
-                    },
-                )
-            self.stdout.write(self.style.SUCCESS("Loaded Defects"))
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f"No Defects sheet found ({e})"))
-
-        # ---- Load Efforts ----
-        try:
-            df_efforts = pd.read_excel(file_path, sheet_name="efforts")
-            for _, row in df_efforts.iterrows():
-                story = None
-                if not pd.isna(row.get("userstory_id")):
-                    story = UserStory.objects.filter(id=int(row["userstory_id"])).first()
+        rejected = sum(counts["invalid"] for counts in stats.values())
+        if rejected:
+            where = f"see {options['errors']}" if options["errors"] else "rerun with --errors FILE for details"
+            self.stdout.write(self.style.WARNING(f"{rejected} rows failed validation and were skipped; {where}"))
 
-                Effort.objects.get_or_create(
-                    id=row.get("ID"),
-                    defaults={
-                        "user_story": story,
-                        "user": row.get("user_name"),
-                        "effort_type": row.get("effort_type"),
-                        "hours": row.get("hours"),
-                    },
-                )
-            self.stdout.write(self.style.SUCCESS("Loaded Efforts"))
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f"No Efforts sheet found ({e})"))
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {total} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)"))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from qa import partitions
+from qa.partitions import PARTITIONED
+
+
+class Command(BaseCommand):
+    help = "Create, convert and prune the monthly partitions of test results and efforts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "action",
+            choices=["convert", "create", "retain"],
+            help="convert: partition the existing tables (once); create: add upcoming months; "
+                 "retain: archive or drop months past the retention window",
+        )
+        parser.add_argument(
+            "--table",
+            choices=[model._meta.model_name for model in PARTITIONED],
+            default=None,
+            help="Only this table (default: all partitioned tables)",
+        )
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=partitions.PARTITION_AHEAD,
+            help="Months to create ahead of the current one",
+        )
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=partitions.RETENTION_MONTHS,
+            help="Whole months of data to keep (retain; default: QA_RETENTION_MONTHS)",
+        )
+        parser.add_argument(
+            "--archive",
+            action="store_true",
+            help="Detach old partitions and keep them as standalone tables instead of dropping them",
+        )
+
+    def handle(self, *args, **options):
+        models = [m for m in PARTITIONED if options["table"] in (None, m._meta.model_name)]
+        action = options["action"]
+        if action != "retain" and not partitions.supported():
+            self.stdout.write(self.style.WARNING("Partitioning needs PostgreSQL; nothing to do"))
+            return
+        if action == "retain" and options["months"] is None:
+            raise CommandError("Set --months or QA_RETENTION_MONTHS")
+
+        for model in models:
+            table = model._meta.db_table
+            if action == "convert":
+                if partitions.is_partitioned(model):
+                    self.stdout.write(f"{table} is already partitioned")
+                    continue
+                partitions.convert(model, options["ahead"])
+                self.stdout.write(self.style.SUCCESS(f"Partitioned {table} by month"))
+            elif action == "create":
+                if not partitions.is_partitioned(model):
+                    raise CommandError(f"{table} is not partitioned; run 'manage_partitions convert' first")
+                created = partitions.ensure_partitions(model, options["ahead"])
+                self.stdout.write(self.style.SUCCESS(
+                    f"{table}: created {', '.join(created)}" if created else f"{table}: up to date"))
+            else:
+                try:
+                    done = partitions.apply_retention(model, options["months"], archive=options["archive"])
+                except ValueError as e:
+                    raise CommandError(str(e))
+                for line in done or [f"{table}: nothing older than {options['months']} months"]:
+                    self.stdout.write(self.style.SUCCESS(line))
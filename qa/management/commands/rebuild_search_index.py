@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from qa.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index (on PostgreSQL this also creates the tsvector column and GIN index)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows indexed per batch",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = rebuild(options["batch_size"])
+        for kind, rows in counts.items():
+            self.stdout.write(self.style.SUCCESS(f"Indexed {rows} {kind} rows"))
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.2f}s"))
@@ -0,0 +1,52 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from qa.jobs import claim_next, requeue_stale, run_job
+from qa.models import ImportJobStatus
+
+
+class Command(BaseCommand):
+    help = "Process queued Excel uploads"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the jobs currently queued and exit instead of polling",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls when the queue is empty",
+        )
+        parser.add_argument(
+            "--requeue-stale",
+            type=float,
+            default=None,
+            metavar="MINUTES",
+            help="Queue again jobs left running for longer than this, e.g. by a worker that died; "
+                 "set it above the longest import",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE("Waiting for import jobs"))
+        while True:
+            if options["requeue_stale"] is not None:
+                requeued = requeue_stale(timedelta(minutes=options["requeue_stale"]))
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f"Requeued {requeued} stale import(s)"))
+            job = claim_next()
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(f"Running import #{job.pk}")
+            job = run_job(job)
+            if job.status == ImportJobStatus.DONE:
+                self.stdout.write(self.style.SUCCESS(f"Import #{job.pk} finished"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Import #{job.pk} failed: {job.error}"))
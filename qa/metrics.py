@@ -0,0 +1,106 @@
+"""Per-sprint dashboard numbers.
+
+``SprintSummary`` holds one precomputed row per sprint. Receivers in
+``qa.receivers`` refresh only the sprints a save, delete or import touched,
+so reading a summary is a primary key lookup rather than GROUP BYs over
+the whole defect, result and effort tables.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import Sprint, Defect, TestResult, Effort, SprintSummary
+
+SUMMARY_FIELDS = ["defects_by_status", "defects_by_severity", "results", "hours_by_type"]
+
+_pending = threading.local()
+
+
+def compute_summaries(sprint_ids):
+    """Aggregate the dashboard numbers for the given sprints: one GROUP BY per measure."""
+    sprint_ids = set(Sprint.objects.filter(id__in=sprint_ids).values_list("id", flat=True))
+    summaries = {sid: {name: {} for name in SUMMARY_FIELDS} for sid in sprint_ids}
+    if not summaries:
+        return summaries
+
+    measures = [
+        ("defects_by_status", Defect.objects, "user_story__sprint_id", "status", Count("id")),
+        ("defects_by_severity", Defect.objects, "user_story__sprint_id", "severity", Count("id")),
+        ("results", TestResult.objects, "test_case__user_story__sprint_id", "result", Count("id")),
+        ("hours_by_type", Effort.objects, "user_story__sprint_id", "effort_type", Sum("hours")),
+    ]
+    for name, manager, sprint_path, key, aggregate in measures:
+        rows = (manager.filter(**{f"{sprint_path}__in": sprint_ids})
+                .values(sprint_path, key).annotate(value=aggregate).order_by()
+                .values_list(sprint_path, key, "value"))
+        for sprint_id, label, value in rows:
+            summaries[sprint_id][name][label or "Unset"] = value
+    return summaries
+
+
+def refresh_summaries(sprint_ids):
+    """Recompute and store the summaries of the given sprints."""
+    summaries = compute_summaries(sprint_ids)
+    SprintSummary.objects.bulk_create(
+        [SprintSummary(sprint_id=sid, **values) for sid, values in summaries.items()],
+        update_conflicts=True,
+        unique_fields=["sprint"],
+        update_fields=SUMMARY_FIELDS + ["updated_at"],
+    )
+
+
+def schedule_refresh(sprint_ids):
+    """Refresh the given sprints once the current transaction commits.
+
+    Sprints touched by several writes in one transaction (a cascading
+    delete, for instance) are refreshed once. Inside ``refresh_once`` the
+    refresh waits for the end of the block.
+    """
+    if not sprint_ids:
+        return
+    if getattr(_pending, "sprint_ids", None) is None:
+        _pending.sprint_ids = set()
+    _pending.sprint_ids.update(sprint_ids)
+    if not getattr(_pending, "deferred", 0):
+        transaction.on_commit(_flush_pending)
+
+
+@contextmanager
+def refresh_once():
+    """Hold back the refreshes scheduled inside the block and run them once when it ends.
+
+    For writers that commit in many batches, such as CI result ingestion,
+    which would otherwise recompute the same sprints after every batch.
+    """
+    _pending.deferred = getattr(_pending, "deferred", 0) + 1
+    try:
+        yield
+    finally:
+        _pending.deferred -= 1
+        if not _pending.deferred and getattr(_pending, "sprint_ids", None):
+            transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    sprint_ids, _pending.sprint_ids = _pending.sprint_ids, set()
+    if sprint_ids:
+        refresh_summaries(sprint_ids)
+
+
+def summary_dict(summary):
+    return {
+        "sprint": summary.sprint_id,
+        **{name: getattr(summary, name) for name in SUMMARY_FIELDS},
+        "updated_at": summary.updated_at,
+    }
+
+
+def sprint_summary(sprint_id):
+    """Return the stored summary of a sprint, computing it the first time. None if no such sprint."""
+    summary = SprintSummary.objects.filter(sprint_id=sprint_id).first()
+    if summary is None:
+        refresh_summaries([sprint_id])
+        summary = SprintSummary.objects.filter(sprint_id=sprint_id).first()
+    return summary_dict(summary) if summary else None
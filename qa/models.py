@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.db.models import Q
 
@@ -42,6 +44,21 @@ class EffortType(models.TextChoices):
     ANALYSIS = "Analysis"
     FIXING = "Fixing"
 
+# --- FIELDS ---
+
+class CreatedAtField(models.DateTimeField):
+    """``auto_now_add`` that keeps a value set explicitly, so imported rows keep their timestamp."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("auto_now_add", True)
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if add and value is not None:
+            return value
+        return super().pre_save(model_instance, add)
+
 # --- MODELS ---
 
 class Sprint(models.Model):
@@ -71,6 +88,10 @@ class UserStory(models.Model):
                 name="user_stories_status_check",
             )
         ]
+        indexes = [
+            models.Index(fields=["sprint", "id"], name="user_stories_sprint_idx"),
+            models.Index(fields=["created_at"], name="user_stories_created_idx"),
+        ]
 
 
 class TestCase(models.Model):
@@ -81,6 +102,11 @@ class TestCase(models.Model):
     created_by = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user_story", "id"], name="test_cases_story_idx"),
+        ]
+
     def __str__(self):
         return f"TC-{self.pk}: {self.title}"
 
@@ -99,6 +125,9 @@ class TestResult(models.Model):
                 name="test_results_result_check",
             )
         ]
+        indexes = [
+            models.Index(fields=["executed_at"], name="test_results_executed_idx"),
+        ]
 
 
 class Defect(models.Model):
@@ -131,6 +160,14 @@ class Defect(models.Model):
                 name="defects_priority_check",
             ),
         ]
+        indexes = [
+            # user_story -> status -> id serves the story/status filters with keyset ordering.
+            models.Index(fields=["user_story", "status", "id"], name="defects_story_status_idx"),
+            models.Index(fields=["status", "id"], name="defects_status_idx"),
+            models.Index(fields=["user_story", "id"], name="defects_open_idx",
+                         condition=Q(status__in=[DefectStatus.OPEN, DefectStatus.IN_PROGRESS])),
+            models.Index(fields=["created_at"], name="defects_created_idx"),
+        ]
 
 
 class Comment(models.Model):
@@ -148,7 +185,7 @@ class Effort(models.Model):
     user = models.TextField(db_column="user")  # keeps DB column name "user"
     effort_type = models.TextField(choices=EffortType.choices)
     hours = models.FloatField()
-    logged_at = models.DateTimeField(auto_now_add=True)
+    logged_at = CreatedAtField()
 
     class Meta:
         constraints = [
@@ -156,4 +193,82 @@ class Effort(models.Model):
                 check=Q(effort_type__in=EffortType.values),
                 name="efforts_effort_type_check",
             )
-        ]
\ No newline at end of file
+        ]
+        indexes = [
+            models.Index(fields=["user_story", "id"], name="efforts_story_idx"),
+            models.Index(fields=["logged_at"], name="efforts_logged_idx"),
+        ]
+
+class ImportJobStatus(models.TextChoices):
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    DONE = "Done"
+    FAILED = "Failed"
+
+
+def import_upload_path(instance, filename):
+    # A directory per upload, so storage never renames the file: single-sheet
+    # CSV/Parquet uploads are matched to their sheet by file name.
+    return f"imports/{uuid.uuid4().hex}/{filename}"
+
+
+class ImportJob(models.Model):
+    file = models.FileField(upload_to=import_upload_path)
+    incremental = models.BooleanField(default=False)
+    status = models.TextField(choices=ImportJobStatus.choices, default=ImportJobStatus.QUEUED)
+    progress = models.JSONField(default=dict)  # {sheet: {"parsed": n, "written": n, "errors": [...]}}
+    error = models.TextField(blank=True, null=True)
+    error_report = models.FileField(upload_to="import-errors/", blank=True)  # rejected rows, if any
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.status})"
+
+
+class ImportFingerprint(models.Model):
+    """Content hash of a sheet as of its last incremental import."""
+    sheet = models.TextField(unique=True)
+    digest = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class SprintSummary(models.Model):
+    """Precomputed dashboard numbers for one sprint, maintained by ``qa.metrics``."""
+    sprint = models.OneToOneField("Sprint", on_delete=models.CASCADE, primary_key=True,
+                                  related_name="summary")
+    defects_by_status = models.JSONField(default=dict)
+    defects_by_severity = models.JSONField(default=dict)
+    results = models.JSONField(default=dict)
+    hours_by_type = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class SearchDocument(models.Model):
+    """Searchable text of one defect, story, test case or comment, maintained by ``qa.search``.
+
+    On PostgreSQL ``manage.py rebuild_search_index`` adds a generated
+    ``vector`` tsvector column with a GIN index to this table.
+    """
+    kind = models.TextField()
+    object_id = models.IntegerField()
+    title = models.TextField(blank=True, default="")
+    body = models.TextField(blank=True, default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="search_documents_object_uniq"),
+        ]
+
+
+class SearchTerm(models.Model):
+    """Inverted index entry used for search where PostgreSQL full-text search is unavailable."""
+    term = models.TextField()
+    document = models.ForeignKey("SearchDocument", on_delete=models.CASCADE, related_name="terms")
+    weight = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["term", "document"], name="search_terms_term_idx"),
+        ]
@@ -0,0 +1,175 @@
+"""Monthly range partitions for the append-only, time-stamped tables.
+
+On PostgreSQL, ``convert`` turns ``TestResult`` (by ``executed_at``) and
+``Effort`` (by ``logged_at``) into tables partitioned by calendar month
+(UTC), with a default partition catching anything outside the created
+ranges. Queries that filter on the timestamp only scan the matching
+months. The primary key becomes ``(id, <timestamp>)``, so these tables
+cannot take ``ON CONFLICT (id)``; the importer writes them through the
+``COPY`` + merge path instead.
+
+``ensure_partitions`` creates the coming months ahead of time and
+``apply_retention`` detaches (archives) or drops months older than the
+retention window. Other databases have no partitions; retention there
+falls back to deleting old rows in batches, which keeps SQLite runs
+working. All of this is driven by ``manage.py manage_partitions``.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import TestResult, Effort
+from .signals import rows_deleted, row_scope
+
+PARTITIONED = {TestResult: "executed_at", Effort: "logged_at"}
+
+PARTITION_AHEAD = getattr(settings, "QA_PARTITION_AHEAD", 3)
+RETENTION_MONTHS = getattr(settings, "QA_RETENTION_MONTHS", None)
+RETENTION_BATCH_SIZE = getattr(settings, "QA_RETENTION_BATCH_SIZE", 10_000)
+
+_partitioned = {}
+
+
+def supported():
+    return connection.vendor == "postgresql"
+
+
+def month_start(value, offset=0):
+    """First instant (UTC) of the month ``offset`` months after the one holding ``value``."""
+    index = value.year * 12 + value.month - 1 + offset
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(model, month):
+    return f"{model._meta.db_table}_p{month:%Y%m}"
+
+
+def is_partitioned(model):
+    """Whether ``model``'s table is a partitioned PostgreSQL table. Cached per process."""
+    if model not in PARTITIONED or not supported():
+        return False
+    if model not in _partitioned:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                           "WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace",
+                           [model._meta.db_table])
+            _partitioned[model] = cursor.fetchone() is not None
+    return _partitioned[model]
+
+
+def list_partitions(model):
+    """Return ``[(month, partition name)]`` of the monthly partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT c.relname FROM pg_inherits i "
+                       "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+                       "WHERE p.relname = %s", [model._meta.db_table])
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f"{model._meta.db_table}_p"
+    months = []
+    for name in names:
+        stamp = name[len(prefix):]
+        if name.startswith(prefix) and stamp.isdigit() and len(stamp) == 6:
+            months.append((datetime(int(stamp[:4]), int(stamp[4:]), 1, tzinfo=dt_timezone.utc), name))
+    return sorted(months)
+
+
+def create_partition(model, month):
+    """Create the partition for ``month``, moving any of its rows out of the default partition."""
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    column = qn(PARTITIONED[model])
+    name = partition_name(model, month)
+    start, end = month_start(month), month_start(month, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(f"WITH moved AS (DELETE FROM {qn(table + '_default')} "
+                       f"WHERE {column} >= %s AND {column} < %s RETURNING *) "
+                       f"INSERT INTO {qn(name)} SELECT * FROM moved", [start, end])
+        cursor.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} "
+                       f"FOR VALUES FROM (%s) TO (%s)", [start, end])
+    return name
+
+
+def ensure_partitions(model, ahead=PARTITION_AHEAD, since=None):
+    """Create every missing monthly partition from ``since`` (default: this month) to ``ahead`` months on."""
+    existing = {month for month, _ in list_partitions(model)}
+    first = month_start(since or timezone.now())
+    last = month_start(timezone.now(), ahead)
+    created = []
+    month = first
+    while month <= last:
+        if month not in existing:
+            created.append(create_partition(model, month))
+        month = month_start(month, 1)
+    return created
+
+
+def convert(model, ahead=PARTITION_AHEAD):
+    """Rebuild ``model``'s table as a monthly-partitioned table, keeping its rows, indexes and keys.
+
+    Runs in one transaction and holds an exclusive lock on the table while it copies.
+    """
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    column = PARTITIONED[model]
+    old = f"{table}_unpartitioned"
+    with transaction.atomic(), connection.schema_editor(atomic=False) as editor:
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(old)}")
+            cursor.execute(f"CREATE TABLE {qn(table)} (LIKE {qn(old)} INCLUDING DEFAULTS "
+                           f"INCLUDING CONSTRAINTS INCLUDING IDENTITY) PARTITION BY RANGE ({qn(column)})")
+            cursor.execute(f"CREATE TABLE {qn(table + '_default')} PARTITION OF {qn(table)} DEFAULT")
+            cursor.execute(f"SELECT min({qn(column)}) FROM {qn(old)}")
+            oldest = cursor.fetchone()[0]
+            _partitioned[model] = True
+            ensure_partitions(model, ahead, since=oldest)
+            cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(old)}")
+            cursor.execute(f"DROP TABLE {qn(old)}")
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(id), 0) + 1, false) "
+                           f"FROM {qn(table)}", [table])
+            cursor.execute(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, {qn(column)})")
+        for field in model._meta.concrete_fields:
+            if field.remote_field and field.db_constraint:
+                editor.execute(editor._create_fk_sql(model, field, "_fk_%(to_table)s_%(to_column)s"))
+        for sql in editor._model_indexes_sql(model):
+            editor.execute(sql)
+
+
+def apply_retention(model, months, archive=False, batch_size=RETENTION_BATCH_SIZE):
+    """Remove data older than ``months`` whole months; returns a list of what was done.
+
+    Partitioned tables detach old partitions (``archive``, leaving them as
+    standalone tables) or drop them. Elsewhere old rows are deleted in
+    batches; archiving needs partitions.
+    """
+    cutoff = month_start(timezone.now(), -months)
+    if is_partitioned(model):
+        qn = connection.ops.quote_name
+        done = []
+        for month, name in list_partitions(model):
+            if month >= cutoff:
+                break
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {qn(model._meta.db_table)} DETACH PARTITION {qn(name)}")
+                if not archive:
+                    cursor.execute(f"DROP TABLE {qn(name)}")
+            done.append(f"{'archived' if archive else 'dropped'} {name}")
+        return done
+
+    if archive:
+        raise ValueError(f"{model._meta.db_table} is not partitioned; only deleting is supported")
+    old = model.objects.filter(**{f"{PARTITIONED[model]}__lt": cutoff})
+    deleted, story_ids, sprint_ids = [], set(), set()
+    # Nothing cascades from these tables, so each batch is one plain DELETE;
+    # receivers hear about the whole run once, through ``rows_deleted``.
+    while ids := list(old.values_list("id", flat=True)[:batch_size]):
+        stories, sprints = row_scope(model, ids, batch_size)
+        story_ids |= stories
+        sprint_ids |= sprints
+        model.objects.filter(id__in=ids)._raw_delete(connection.alias)
+        deleted += ids
+    if deleted:
+        rows_deleted.send(sender=model, ids=deleted, story_ids=story_ids, sprint_ids=sprint_ids)
+    return [f"deleted {len(deleted)} rows from {model._meta.db_table}"]
@@ -0,0 +1,149 @@
+import threading
+from collections import defaultdict
+
+from django.db import connections, transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+
+from .cache import DEPENDENT_TABLES, invalidate
+from .importer import SHEETS
+from .metrics import schedule_refresh
+from .refcache import forget
+from .search import SEARCHABLE, ensure_vector, index_objects, unindex_objects
+from .models import ImportFingerprint, UserStory, TestCase, TestResult, Defect, Effort
+from .signals import deletion_scope, rows_deleted, rows_imported, row_scope
+
+SHEET_BY_MODEL = {spec.model: sheet for sheet, spec in SHEETS.items()}
+# Models whose rows feed the sprint summaries.
+SUMMARY_MODELS = (UserStory, TestCase, TestResult, Defect, Effort)
+
+# Deletes in progress on this thread, keyed by the id of the instance or
+# queryset ``delete()`` was called on.
+_deleting = threading.local()
+
+
+def forget_sheet_fingerprint(sender, **kwargs):
+    """A row written outside an incremental import means the next upload must diff that sheet again.
+
+    Incremental imports send ``rows_imported`` too, but store the new
+    fingerprint only after their last write.
+    """
+    ImportFingerprint.objects.filter(sheet=SHEET_BY_MODEL[sender]).delete()
+
+
+def remember_scope(sender, instance, **kwargs):
+    """Note where a row belongs before it changes, so its old sprint and story are refreshed too."""
+    if instance.pk is not None:
+        instance._qa_scope = row_scope(sender, [instance.pk])
+
+
+def refresh_sprint_summaries(sender, instance, **kwargs):
+    _, before = getattr(instance, "_qa_scope", (set(), set()))
+    _, after = row_scope(sender, [instance.pk])
+    schedule_refresh(before | after)
+
+
+def refresh_bulk_summaries(sender, sprint_ids, **kwargs):
+    if sender in SUMMARY_MODELS:
+        schedule_refresh(sprint_ids)
+
+
+def invalidate_cached_views(sender, instance, **kwargs):
+    stories, sprints = getattr(instance, "_qa_scope", (set(), set()))
+    after_stories, after_sprints = row_scope(sender, [instance.pk])
+    # Evicting before commit would let a concurrent request cache the old rows again.
+    transaction.on_commit(lambda: invalidate(sender, stories | after_stories, sprints | after_sprints))
+
+
+def invalidate_bulk_views(sender, story_ids, sprint_ids, **kwargs):
+    transaction.on_commit(lambda: invalidate(sender, story_ids, sprint_ids))
+
+
+def forget_references(sender, **kwargs):
+    forget(sender)
+
+
+def index_saved_row(sender, instance, **kwargs):
+    index_objects(sender, [instance.pk])
+
+
+def index_imported_rows(sender, ids, **kwargs):
+    index_objects(sender, ids)
+
+
+def unindex_deleted_rows(sender, ids, **kwargs):
+    unindex_objects(sender, ids)
+
+
+def collect_deleted_row(sender, instance, origin=None, **kwargs):
+    """Note a row a ``delete()`` call is about to remove; the call's scope is worked out on its first row.
+
+    Django sends every ``pre_delete`` of a call before any row is deleted,
+    and every ``post_delete`` after, so the rows are announced through
+    ``rows_deleted`` once the last ``post_delete`` arrives.
+    """
+    origin = instance if origin is None else origin
+    if getattr(_deleting, "calls", None) is None:
+        _deleting.calls = {}
+    pending = _deleting.calls
+    if id(origin) not in pending:
+        # Holding on to ``origin`` keeps its id from being reused mid-delete.
+        pending[id(origin)] = {"origin": origin, "scope": deletion_scope(origin),
+                               "ids": defaultdict(list), "left": 0}
+    call = pending[id(origin)]
+    call["ids"][sender].append(instance.pk)
+    call["left"] += 1
+
+
+def announce_deleted_rows(sender, instance, origin=None, **kwargs):
+    pending = getattr(_deleting, "calls", None) or {}
+    key = id(instance if origin is None else origin)
+    if key not in pending:
+        return
+    call = pending[key]
+    call["left"] -= 1
+    if call["left"]:
+        return
+    del pending[key]
+    story_ids, sprint_ids = call["scope"]
+    for model, ids in call["ids"].items():
+        rows_deleted.send(sender=model, ids=ids, story_ids=story_ids, sprint_ids=sprint_ids)
+
+
+def create_search_vector(using, **kwargs):
+    """The tsvector column is not a model field, so ``migrate`` cannot create it."""
+    if connections[using].vendor == "postgresql":
+        ensure_vector(using)
+
+
+# Connected per model rather than for every sender, so deletes of other
+# models keep Django's fast path. Deletes are announced through
+# ``rows_deleted`` once per call, so a cascade over thousands of rows costs
+# a handful of queries rather than several per row.
+for model in SHEET_BY_MODEL:
+    post_save.connect(forget_sheet_fingerprint, sender=model)
+    rows_imported.connect(forget_sheet_fingerprint, sender=model)
+    rows_deleted.connect(forget_sheet_fingerprint, sender=model)
+
+for model in set(SUMMARY_MODELS) | set(DEPENDENT_TABLES):
+    pre_save.connect(remember_scope, sender=model)
+
+for model in SUMMARY_MODELS:
+    post_save.connect(refresh_sprint_summaries, sender=model)
+
+for model in DEPENDENT_TABLES:
+    post_save.connect(invalidate_cached_views, sender=model)
+    post_save.connect(forget_references, sender=model)
+
+for model in SEARCHABLE:
+    post_save.connect(index_saved_row, sender=model)
+
+for model in set(SHEET_BY_MODEL) | set(SUMMARY_MODELS) | set(DEPENDENT_TABLES) | set(SEARCHABLE):
+    pre_delete.connect(collect_deleted_row, sender=model)
+    post_delete.connect(announce_deleted_rows, sender=model)
+
+for signal in (rows_imported, rows_deleted):
+    signal.connect(refresh_bulk_summaries)
+    signal.connect(invalidate_bulk_views)
+    signal.connect(forget_references)
+rows_imported.connect(index_imported_rows)
+rows_deleted.connect(unindex_deleted_rows)
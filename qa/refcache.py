@@ -0,0 +1,126 @@
+"""In-process cache of which referenced rows exist.
+
+Imports and result ingestion check every foreign key they write against
+the database. ``RefCache`` remembers the rows it found (``field`` value to
+primary key) in a bounded LRU, so repeat uploads and CI runs only query
+keys they have not seen before, with one ``__in`` query per 10,000 of them.
+Misses are not remembered: a row created by another process since then,
+before its generation token reaches this one, must not be turned away.
+
+A model's entries are dropped as a whole by receivers in ``qa.receivers``
+on every save, delete and import of the model, and again whenever its
+generation token in ``qa.cache`` changes, which happens once such a write
+commits. With a shared cache backend the token also carries writes made
+by other processes (the import worker, for instance); ``QA_REFCACHE_TTL``
+bounds how long an answer is trusted otherwise, and covers writes that
+bypass signals such as ``QuerySet.update``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .cache import DEPENDENT_TABLES, generation
+
+REFCACHE_SIZE = getattr(settings, "QA_REFCACHE_SIZE", 100_000)
+REFCACHE_TTL = getattr(settings, "QA_REFCACHE_TTL", 60)
+# Keys per lookup query, well under SQLite's limit on query parameters.
+REFCACHE_QUERY_SIZE = 10_000
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class RefCache:
+    """LRU of ``field`` value -> primary key of ``model``; duplicates resolve to the oldest row."""
+
+    def __init__(self, model, field="id", size=REFCACHE_SIZE, ttl=REFCACHE_TTL):
+        if model not in DEPENDENT_TABLES:
+            raise ValueError(f"{model.__name__} writes do not bump a generation token")
+        self.model = model
+        self.field = field
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.generation = None
+        # Bumped by every clear, so answers fetched before one are not stored after it.
+        self.epoch = 0
+        self.lock = threading.Lock()
+
+    def resolve(self, values):
+        """Map every value to its primary key or None, querying only the ones not found before."""
+        current = generation(self.model)
+        now = time.monotonic()
+        found, missing = {}, set()
+        with self.lock:
+            if current != self.generation:
+                self._clear()
+                self.generation = current
+            epoch = self.epoch
+            for value in values:
+                entry = self.entries.get(value)
+                if entry is None or entry[1] < now:
+                    missing.add(value)
+                else:
+                    self.entries.move_to_end(value)
+                    found[value] = entry[0]
+        if not missing:
+            return found
+
+        fetched = dict.fromkeys(missing)
+        missing = list(missing)
+        for start in range(0, len(missing), REFCACHE_QUERY_SIZE):
+            rows = (self.model.objects.filter(**{f"{self.field}__in": missing[start:start + REFCACHE_QUERY_SIZE]})
+                    .order_by("-id").values_list(self.field, "id"))
+            for value, pk in rows:
+                fetched[value] = pk
+        found.update(fetched)
+
+        expires = now + self.ttl
+        with self.lock:
+            if self.epoch == epoch:
+                for value, pk in fetched.items():
+                    if pk is None:
+                        continue
+                    self.entries[value] = (pk, expires)
+                    self.entries.move_to_end(value)
+                while len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+        return found
+
+    def _clear(self):
+        self.entries.clear()
+        self.epoch += 1
+
+    def clear(self):
+        with self.lock:
+            self._clear()
+
+
+def references(model, field="id"):
+    """The process-wide ``RefCache`` of ``model`` keyed by ``field``."""
+    key = (model, field)
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = RefCache(model, field)
+        return _registry[key]
+
+
+def existing_ids(model, ids):
+    """The subset of ``ids`` that are primary keys of ``model``."""
+    return {pk for pk in references(model).resolve(ids).values() if pk is not None}
+
+
+def forget(model):
+    """Drop every cached answer about ``model`` in this process."""
+    with _registry_lock:
+        caches = [refs for (cached, _), refs in _registry.items() if cached is model]
+    for refs in caches:
+        refs.clear()
+
+
+def clear_all():
+    with _registry_lock:
+        for refs in _registry.values():
+            refs.clear()
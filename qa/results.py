@@ -0,0 +1,160 @@
+"""Batch ingestion of test results from CI.
+
+``POST /results/`` accepts a JUnit XML report or NDJSON (one result object
+per line) and bulk inserts ``TestResult`` rows. Payloads are parsed as a
+stream, so memory depends on ``RESULTS_BATCH_SIZE`` rather than on the
+report size. Results only ever insert, so concurrent pipelines do not
+contend for row locks.
+
+Results are matched to test cases by id (``test_case_id``; a JUnit
+``<property name="test_case_id">``) or else by exact title (``test_case``;
+the JUnit test name). Lookups go through the shared reference cache, so
+only keys no earlier request has seen are fetched, with one query per
+batch. ``executed_at`` is the ingestion
+time, as the field is ``auto_now_add``.
+"""
+import json
+from xml.etree.ElementTree import iterparse
+
+from django.conf import settings
+
+from .metrics import refresh_once
+from .models import TestCase, TestResult, TestResultStatus
+from .refcache import references
+from .signals import rows_imported, row_scope
+
+RESULTS_BATCH_SIZE = getattr(settings, "QA_RESULTS_BATCH_SIZE", 2000)
+MAX_REPORTED_ERRORS = 20
+
+RESULT_ALIASES = {
+    "pass": TestResultStatus.PASS_, "passed": TestResultStatus.PASS_, "success": TestResultStatus.PASS_,
+    "fail": TestResultStatus.FAIL, "failed": TestResultStatus.FAIL, "failure": TestResultStatus.FAIL,
+    "error": TestResultStatus.FAIL, "blocked": TestResultStatus.BLOCKED,
+    "skip": TestResultStatus.SKIPPED, "skipped": TestResultStatus.SKIPPED,
+}
+
+
+def parse_junit(stream):
+    """Yield result dicts from a JUnit XML report, one ``<testcase>`` at a time."""
+    for _, elem in iterparse(stream, events=("end",)):
+        if elem.tag != "testcase":
+            continue
+        if elem.find("failure") is not None or elem.find("error") is not None:
+            result = TestResultStatus.FAIL
+        elif elem.find("skipped") is not None:
+            result = TestResultStatus.SKIPPED
+        else:
+            result = TestResultStatus.PASS_
+        props = {p.get("name"): p.get("value") for p in elem.iterfind("properties/property")}
+        yield {
+            "test_case_id": props.get("test_case_id"),
+            "test_case": elem.get("name"),
+            "result": result,
+            "executed_by": props.get("executed_by"),
+            "environment": props.get("environment"),
+        }
+        elem.clear()
+
+
+def parse_ndjson(stream):
+    """Yield result dicts from NDJSON, skipping blank lines."""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+class TestCaseLookup:
+    """Maps payload references to TestCase ids for one request, backed by the shared reference cache."""
+
+    def __init__(self):
+        self.ids = {}
+        self.titles = {}
+
+    def prefetch(self, rows):
+        """Load every unseen id and title of ``rows`` with one query each."""
+        ids, titles = set(), set()
+        for row in rows:
+            pk = _as_id(row.get("test_case_id"))
+            if pk is not None:
+                if pk not in self.ids:
+                    ids.add(pk)
+            elif row.get("test_case") and row["test_case"] not in self.titles:
+                titles.add(row["test_case"])
+        if ids:
+            found = references(TestCase).resolve(ids)
+            self.ids.update((pk, found[pk] is not None) for pk in ids)
+        if titles:
+            # Duplicate titles resolve to the oldest test case.
+            self.titles.update(references(TestCase, "title").resolve(titles))
+
+    def resolve(self, row):
+        pk = _as_id(row.get("test_case_id"))
+        if pk is not None:
+            return pk if self.ids.get(pk) else None
+        return self.titles.get(row.get("test_case"))
+
+
+def _as_id(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_results(rows, executed_by=None, environment=None, batch_size=RESULTS_BATCH_SIZE):
+    """Insert ``TestResult`` rows for an iterable of result dicts.
+
+    ``executed_by`` and ``environment`` fill in rows that do not set them.
+    Returns ``{"received", "inserted", "unmatched", "invalid", "errors"}``;
+    rows that cannot be matched or carry an unknown result are skipped and
+    the first few are described in ``errors``. Sprint summaries are
+    refreshed once, after the last batch.
+    """
+    stats = {"received": 0, "inserted": 0, "unmatched": 0, "invalid": 0, "errors": []}
+    lookup = TestCaseLookup()
+
+    def reject(kind, message):
+        stats[kind] += 1
+        if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+            stats["errors"].append(message)
+
+    with refresh_once():
+        for batch in _batches(rows, batch_size):
+            stats["received"] += len(batch)
+            lookup.prefetch(batch)
+            objs = []
+            for row in batch:
+                result = RESULT_ALIASES.get(str(row.get("result") or "").strip().lower())
+                if result is None:
+                    reject("invalid", f"Unknown result {row.get('result')!r}")
+                    continue
+                case_id = lookup.resolve(row)
+                if case_id is None:
+                    reject("unmatched", f"No test case {row.get('test_case_id') or row.get('test_case')!r}")
+                    continue
+                objs.append(TestResult(
+                    test_case_id=case_id,
+                    result=result,
+                    executed_by=row.get("executed_by") or executed_by,
+                    environment=row.get("environment") or environment,
+                ))
+            if not objs:
+                continue
+            created = TestResult.objects.bulk_create(objs)
+            stats["inserted"] += len(created)
+            if rows_imported.has_listeners(TestResult):
+                story_ids, sprint_ids = row_scope(TestCase, list({obj.test_case_id for obj in objs}))
+                rows_imported.send(sender=TestResult, ids=[obj.pk for obj in created],
+                                   story_ids=story_ids, sprint_ids=sprint_ids)
+    return stats
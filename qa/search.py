@@ -0,0 +1,191 @@
+"""Full-text search over defects, user stories, test cases and comments.
+
+Every searchable row has a ``SearchDocument`` holding its title and body.
+On PostgreSQL the table carries a generated, weighted ``tsvector`` column
+with a GIN index (title weighs more than body), and queries use
+``websearch_to_tsquery`` ranked by ``ts_rank``. Elsewhere the same
+documents are tokenized in Python into ``SearchTerm`` rows, an inverted
+index on ``(term, document)``; a query matches documents holding every
+term, ranked by the summed term weights. The fallback has no stemming.
+
+Receivers in ``qa.receivers`` keep documents current on saves, deletes and
+imports, and add the ``tsvector`` column after every ``migrate``;
+``manage.py rebuild_search_index`` rebuilds everything.
+"""
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Count, Sum
+
+from .models import UserStory, TestCase, Defect, Comment, SearchDocument, SearchTerm
+
+# model: (kind, title field, body field)
+SEARCHABLE = {
+    Defect: ("defect", "title", "description"),
+    UserStory: ("userstory", "title", "description"),
+    TestCase: ("testcase", "title", "description"),
+    Comment: ("comment", None, "comment_text"),
+}
+KINDS = {kind: model for model, (kind, _, _) in SEARCHABLE.items()}
+
+SEARCH_CONFIG = getattr(settings, "QA_SEARCH_CONFIG", "english")
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+TITLE_WEIGHT = 2.0
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or that the to was with".split())
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def use_postgres():
+    return connection.vendor == "postgresql"
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def ensure_vector(using=DEFAULT_DB_ALIAS):
+    """Add the generated tsvector column and its GIN index on PostgreSQL (idempotent)."""
+    conn = connections[using]
+    table = conn.ops.quote_name(SearchDocument._meta.db_table)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS vector tsvector GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(body, '')), 'B')) STORED")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS search_documents_vector_idx ON {table} USING GIN (vector)")
+
+
+def _terms(document_id, title, body):
+    """``(term, document_id, weight)`` rows of one document."""
+    weights = Counter()
+    for token in tokenize(title):
+        weights[token] += TITLE_WEIGHT
+    for token in tokenize(body):
+        weights[token] += 1.0
+    return [(t, document_id, w) for t, w in weights.items()]
+
+
+def index_objects(model, ids, batch_size=1000):
+    """(Re)index the given rows of ``model``; rows that no longer exist are unindexed.
+
+    Works ``batch_size`` rows at a time. Documents whose title and body are
+    unchanged are left alone, so re-importing a sheet rewrites only the
+    rows whose text was edited.
+    """
+    if model not in SEARCHABLE or not ids:
+        return
+    ids = list(ids)
+    for start in range(0, len(ids), batch_size):
+        _index_batch(model, ids[start:start + batch_size])
+
+
+def _index_batch(model, ids):
+    kind, title_field, body_field = SEARCHABLE[model]
+    fields = ["id", body_field] + ([title_field] if title_field else [])
+    texts = {row["id"]: ((row.get(title_field) or "") if title_field else "", row[body_field] or "")
+             for row in model.objects.filter(id__in=ids).values(*fields)}
+    with transaction.atomic():
+        unindex_objects(model, set(ids) - set(texts))
+        stored = {object_id: (title, body) for object_id, title, body in
+                  SearchDocument.objects.filter(kind=kind, object_id__in=texts)
+                  .values_list("object_id", "title", "body")}
+        changed = {pk: text for pk, text in texts.items() if stored.get(pk) != text}
+        if not changed:
+            return
+        SearchDocument.objects.bulk_create(
+            [SearchDocument(kind=kind, object_id=pk, title=title, body=body)
+             for pk, (title, body) in changed.items()],
+            update_conflicts=True, unique_fields=["kind", "object_id"], update_fields=["title", "body"])
+        if use_postgres():
+            return
+        docs = list(SearchDocument.objects.filter(kind=kind, object_id__in=changed)
+                    .values_list("id", "title", "body"))
+        SearchTerm.objects.filter(document_id__in=[doc[0] for doc in docs]).delete()
+        # Tens of terms per document: building model instances would cost more than tokenizing.
+        table = connection.ops.quote_name(SearchTerm._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.executemany(f"INSERT INTO {table} (term, document_id, weight) VALUES (%s, %s, %s)",
+                               [term for doc in docs for term in _terms(*doc)])
+
+
+def unindex_objects(model, ids, batch_size=1000):
+    if model not in SEARCHABLE or not ids:
+        return
+    ids = list(ids)
+    for start in range(0, len(ids), batch_size):
+        SearchDocument.objects.filter(kind=SEARCHABLE[model][0], object_id__in=ids[start:start + batch_size]).delete()
+
+
+def rebuild(batch_size=5000):
+    """Reindex every searchable row; returns ``{kind: rows}``."""
+    if use_postgres():
+        ensure_vector()
+    counts = {}
+    for model, (kind, _, _) in SEARCHABLE.items():
+        SearchDocument.objects.filter(kind=kind).exclude(object_id__in=model.objects.values("id")).delete()
+        ids = model.objects.order_by("id").values_list("id", flat=True)
+        counts[kind] = 0
+        batch = []
+        for pk in ids.iterator(chunk_size=batch_size):
+            batch.append(pk)
+            if len(batch) >= batch_size:
+                index_objects(model, batch)
+                counts[kind] += len(batch)
+                batch = []
+        index_objects(model, batch)
+        counts[kind] += len(batch)
+    return counts
+
+
+def _postgres_hits(q, kinds, offset, limit):
+    table = connection.ops.quote_name(SearchDocument._meta.db_table)
+    query = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id, ts_rank(vector, {query}) AS rank FROM {table} "
+            f"WHERE vector @@ {query} AND kind = ANY(%s) "
+            f"ORDER BY rank DESC, id LIMIT %s OFFSET %s",
+            [q, q, list(kinds), limit, offset])
+        return cursor.fetchall()
+
+
+def _fallback_hits(q, kinds, offset, limit):
+    terms = set(tokenize(q))
+    if not terms:
+        return []
+    rows = (SearchTerm.objects.filter(term__in=terms, document__kind__in=kinds)
+            .values("document_id")
+            .annotate(matched=Count("term", distinct=True), rank=Sum("weight"))
+            .filter(matched=len(terms))
+            .order_by("-rank", "document_id")
+            .values_list("document_id", "rank"))
+    return list(rows[offset:offset + limit])
+
+
+def search(q, kinds=None, offset=0, limit=SEARCH_PAGE_SIZE):
+    """Return ``(hits, next_offset)`` for a query, best match first.
+
+    ``hits`` are dicts with ``kind``, ``id`` (of the matched row), ``title``,
+    ``snippet`` and ``rank``; ``next_offset`` is None on the last page.
+    """
+    kinds = [k for k in (kinds or KINDS) if k in KINDS]
+    limit = min(max(limit, 1), MAX_SEARCH_PAGE_SIZE)
+    if not q.strip() or not kinds:
+        return [], None
+    finder = _postgres_hits if use_postgres() else _fallback_hits
+    ranked = finder(q, kinds, offset, limit + 1)
+    next_offset = offset + limit if len(ranked) > limit else None
+    ranked = ranked[:limit]
+    docs = SearchDocument.objects.in_bulk([doc_id for doc_id, _ in ranked])
+    hits = [{
+        "kind": docs[doc_id].kind,
+        "id": docs[doc_id].object_id,
+        "title": docs[doc_id].title,
+        "snippet": docs[doc_id].body[:200],
+        "rank": float(rank),
+    } for doc_id, rank in ranked if doc_id in docs]
+    return hits, next_offset
@@ -0,0 +1,72 @@
+"""Signals sent by the qa app and the lookup receivers use to scope a write."""
+from django.db import models
+from django.dispatch import Signal
+
+from .models import Sprint, UserStory, TestCase, TestResult, Defect, Effort
+
+# Sent by the import engine after each bulk write, since bulk SQL bypasses
+# post_save. Receivers get ``ids`` plus ``story_ids`` and ``sprint_ids``
+# covering where the rows belonged both before and after the write.
+rows_imported = Signal()
+
+# Sent once per model after a ``delete()`` call, with the same arguments as
+# ``rows_imported``; the scope covers the deleted rows and their cascade.
+rows_deleted = Signal()
+
+# Lookup paths from each model to its user story and its sprint.
+SCOPE_PATHS = {
+    Sprint: (None, "id"),
+    UserStory: ("id", "sprint_id"),
+    TestCase: ("user_story_id", "user_story__sprint_id"),
+    Defect: ("user_story_id", "user_story__sprint_id"),
+    Effort: ("user_story_id", "user_story__sprint_id"),
+    TestResult: ("test_case__user_story_id", "test_case__user_story__sprint_id"),
+}
+
+
+def row_scope(model, ids, batch_size=1000):
+    """Return ``(story_ids, sprint_ids)`` the given rows currently belong to.
+
+    Looks the rows up ``batch_size`` ids per query, so a whole sheet stays
+    under the database's limit on query parameters.
+    """
+    if model not in SCOPE_PATHS or not ids:
+        return set(), set()
+    story_path, sprint_path = SCOPE_PATHS[model]
+    if story_path is None:
+        return set(), set(ids)
+    ids = list(ids)
+    story_ids, sprint_ids = set(), set()
+    for start in range(0, len(ids), batch_size):
+        rows = model.objects.filter(id__in=ids[start:start + batch_size]).values_list(story_path, sprint_path)
+        stories, sprints = _scope(rows)
+        story_ids |= stories
+        sprint_ids |= sprints
+    return story_ids, sprint_ids
+
+
+def _scope(pairs):
+    story_ids, sprint_ids = set(), set()
+    for story_id, sprint_id in pairs:
+        if story_id is not None:
+            story_ids.add(story_id)
+        if sprint_id is not None:
+            sprint_ids.add(sprint_id)
+    return story_ids, sprint_ids
+
+
+def deletion_scope(origin):
+    """Return ``(story_ids, sprint_ids)`` touched by deleting ``origin`` and everything it cascades to.
+
+    ``origin`` is the instance or queryset ``delete()`` was called on. Cascaded
+    rows belong to the same stories and sprints as the row they hang off, so
+    a delete of any size costs one or two queries.
+    """
+    rows = type(origin).objects.filter(pk=origin.pk) if isinstance(origin, models.Model) else origin
+    if rows.model not in SCOPE_PATHS:
+        return set(), set()
+    if rows.model is Sprint:
+        # A sprint's stories go with it, so their cached views must go too.
+        story_ids = set(UserStory.objects.filter(sprint__in=rows.values("id")).values_list("id", flat=True))
+        return story_ids, set(rows.values_list("id", flat=True))
+    return _scope(rows.values_list(*SCOPE_PATHS[rows.model]))
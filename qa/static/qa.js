@@ -1,6 +1,70 @@
 function showSection(id) {
     document.querySelectorAll('.section').forEach(s => s.style.display = 'none');
-    document.getElementById(id).style.display = 'block';
+    const section = document.getElementById(id);
+    section.style.display = 'block';
+    section.querySelectorAll("select[data-picker]").forEach(select => select.ensureLoaded());
+}
+
+// Searchable picker: options come a page at a time from the select's data-picker endpoint
+const PICKER_PAGE_SIZE = 100;
+
+function setupPicker(select) {
+    const placeholder = select.options[0].outerHTML;
+    const label = select.getAttribute("data-picker-label");
+    const search = document.querySelector(`[data-picker-search="${select.id}"]`);
+    let loaded = false;
+    let timer = null;
+    select.pickerParams = new URLSearchParams();
+
+    function load(cursor) {
+        const params = new URLSearchParams(select.pickerParams);
+        if (search && search.value.trim()) params.set("q", search.value.trim());
+        params.set("limit", PICKER_PAGE_SIZE);
+        if (cursor) params.set("cursor", cursor);
+
+        fetch(select.getAttribute("data-picker") + "?" + params.toString())
+            .then(res => res.json().then(rows => [rows, res.headers.get("X-Next-Cursor")]))
+            .then(([rows, next]) => {
+                if (cursor) {
+                    select.querySelectorAll("option[data-more]").forEach(opt => opt.remove());
+                } else {
+                    select.innerHTML = placeholder;
+                }
+                rows.forEach(row => select.appendChild(new Option(row[label], row.id)));
+                if (next) {
+                    const more = new Option("More…", "");
+                    more.setAttribute("data-more", next);
+                    select.appendChild(more);
+                }
+            })
+            .catch(err => {
+                console.error("Error loading options:", err);
+            });
+    }
+
+    select.reload = function () {
+        loaded = true;
+        load(null);
+    };
+    select.ensureLoaded = function () {
+        if (!loaded) select.reload();
+    };
+
+    select.addEventListener("focus", select.ensureLoaded);
+    select.addEventListener("change", function (e) {
+        const chosen = select.selectedOptions[0];
+        if (chosen && chosen.hasAttribute("data-more")) {
+            e.stopImmediatePropagation();
+            select.value = "";
+            load(chosen.getAttribute("data-more"));
+        }
+    });
+    if (search) {
+        search.addEventListener("input", function () {
+            clearTimeout(timer);
+            timer = setTimeout(select.reload, 300);
+        });
+    }
 }
 
 // Generic AJAX form handler (GET forms)
@@ -13,12 +77,14 @@ function setupAjaxForm(formId, resultId) {
 
         const endpoint = form.getAttribute("data-endpoint"); // ✅ read from data-endpoint
         const formData = new FormData(form);
-        const params = new URLSearchParams(formData).toString();
+        const params = new URLSearchParams(formData);
 
-        fetch(endpoint + "?" + params)
-            .then(res => res.text())
-            .then(html => {
-                document.getElementById(resultId).innerHTML = html;
+        fetch(endpoint + "?" + params.toString())
+            .then(res => Promise.all([res.text(), res.headers.get("X-Next-Cursor")]))
+            .then(([html, cursor]) => {
+                const result = document.getElementById(resultId);
+                result.innerHTML = html;
+                watchNextPage(result, endpoint, params, cursor);
             })
             .catch(err => {
                 document.getElementById(resultId).innerHTML = "<p class='text-danger'>Error loading data</p>";
@@ -27,6 +93,30 @@ function setupAjaxForm(formId, resultId) {
     });
 }
 
+// Infinite scroll: fetch the next page once the last row comes into view
+function watchNextPage(result, endpoint, params, cursor) {
+    const tbody = result.querySelector("tbody");
+    if (!cursor || !tbody || !tbody.lastElementChild) return;
+
+    const observer = new IntersectionObserver(entries => {
+        if (!entries[0].isIntersecting) return;
+        observer.disconnect();
+
+        const next = new URLSearchParams(params);
+        next.set("cursor", cursor);
+        fetch(endpoint + "?" + next.toString())
+            .then(res => Promise.all([res.text(), res.headers.get("X-Next-Cursor")]))
+            .then(([html, nextCursor]) => {
+                tbody.insertAdjacentHTML("beforeend", html);
+                watchNextPage(result, endpoint, params, nextCursor);
+            })
+            .catch(err => {
+                console.error("Error loading more rows:", err);
+            });
+    });
+    observer.observe(tbody.lastElementChild);
+}
+
 document.addEventListener("DOMContentLoaded", function () {
     // Setup AJAX forms
     setupAjaxForm("userstories-form", "userstories-table");
@@ -34,32 +124,108 @@ document.addEventListener("DOMContentLoaded", function () {
     setupAjaxForm("testcases-form", "testcases-table");
     setupAjaxForm("efforts-form", "efforts-table");
 
+    // Pickers first, so their "More…" option never reaches the other change handlers
+    document.querySelectorAll("select[data-picker]").forEach(setupPicker);
+
     // Dependent dropdown: Defects -> User Stories filtered by Sprint
     const sprintDef = document.getElementById("sprint_def");
     const userStoryDef = document.getElementById("user_story_def");
 
     if (sprintDef && userStoryDef) {
         sprintDef.addEventListener("change", function () {
-            const sprintId = sprintDef.value;
+            if (sprintDef.value) {
+                userStoryDef.pickerParams.set("sprint_id", sprintDef.value);
+            } else {
+                userStoryDef.pickerParams.delete("sprint_id");
+            }
+            userStoryDef.reload();
+        });
+    }
+
+    // Full-text search with a "More results" button
+    const searchForm = document.getElementById("search-form");
+    if (searchForm) {
+        const list = document.getElementById("search-results");
+        const more = document.getElementById("search-more");
+        let params = null;
+
+        function runSearch(cursor) {
+            const query = new URLSearchParams(params);
+            if (cursor) query.set("cursor", cursor);
+            fetch(searchForm.getAttribute("data-endpoint") + "?" + query.toString())
+                .then(res => res.json())
+                .then(page => {
+                    if (!cursor) list.innerHTML = "";
+                    page.results.forEach(hit => {
+                        const item = document.createElement("li");
+                        item.className = "list-group-item";
+                        item.innerHTML = `<span class="badge text-bg-light me-2"></span><strong></strong><div class="small text-muted"></div>`;
+                        item.querySelector(".badge").textContent = `${hit.kind} #${hit.id}`;
+                        item.querySelector("strong").textContent = hit.title;
+                        item.querySelector("div").textContent = hit.snippet;
+                        list.appendChild(item);
+                    });
+                    if (!cursor && !page.results.length) list.innerHTML = "<li class='list-group-item'>No matches</li>";
+                    more.classList.toggle("d-none", page.next === null);
+                    more.dataset.cursor = page.next;
+                })
+                .catch(err => {
+                    list.innerHTML = "<li class='list-group-item text-danger'>Error searching</li>";
+                    console.error(err);
+                });
+        }
+
+        searchForm.addEventListener("submit", function (e) {
+            e.preventDefault();
+            params = new URLSearchParams(new FormData(searchForm));
+            if (!params.get("kind")) params.delete("kind");
+            runSearch(null);
+        });
+        more.addEventListener("click", () => runSearch(more.dataset.cursor));
+    }
 
-            if (!sprintId) {
-                userStoryDef.innerHTML = '<option value="">-- All --</option>';
+    // Sprint dashboard: summary and the first page of every table from one request
+    const dashForm = document.getElementById("dashboard-form");
+    const sprintDash = document.getElementById("sprint_dash");
+    if (dashForm && sprintDash) {
+        sprintDash.addEventListener("change", function () {
+            const panel = document.getElementById("dashboard-panel");
+            if (!sprintDash.value) {
+                panel.innerHTML = "";
                 return;
             }
 
-            fetch(`/userstories-for-sprint/?sprint_id=${sprintId}`)
+            fetch(dashForm.getAttribute("data-endpoint") + "?sprint=" + sprintDash.value)
                 .then(res => res.json())
-                .then(data => {
-                    userStoryDef.innerHTML = '<option value="">-- All --</option>';
-                    data.forEach(story => {
-                        const opt = document.createElement("option");
-                        opt.value = story.id;
-                        opt.textContent = story.title;
-                        userStoryDef.appendChild(opt);
-                    });
+                .then(dashboard => {
+                    const summary = dashboard.summary;
+                    const blocks = [
+                        ["Defects by status", summary.defects_by_status],
+                        ["Defects by severity", summary.defects_by_severity],
+                        ["Test results", summary.results],
+                        ["Hours by effort type", summary.hours_by_type],
+                    ];
+                    const tables = [
+                        ["User Stories", dashboard.tables.userstories],
+                        ["Defects", dashboard.tables.defects],
+                        ["Test Cases", dashboard.tables.testcases],
+                        ["Efforts", dashboard.tables.efforts],
+                    ];
+                    panel.innerHTML = blocks.map(([title, counts]) => `
+                        <div class="col-md-3">
+                            <h6>${title}</h6>
+                            <table>
+                                ${Object.entries(counts).map(([k, v]) => `<tr><td>${k}</td><td>${v}</td></tr>`).join("") || "<tr><td>None</td></tr>"}
+                            </table>
+                        </div>`).join("") + tables.map(([title, table]) => `
+                        <div class="col-12 mt-4">
+                            <h5>${title} <span class="badge text-bg-light">${table.count}</span></h5>
+                            ${table.html}
+                        </div>`).join("");
                 })
                 .catch(err => {
-                    console.error("Error fetching user stories:", err);
+                    panel.innerHTML = "<p class='text-danger'>Error loading summary</p>";
+                    console.error(err);
                 });
         });
     }
@@ -83,7 +249,8 @@ document.addEventListener("DOMContentLoaded", function () {
             .then(res => res.json())
             .then(data => {
                 if (data.success) {
-                    showToast("✅ " + data.message, "success");
+                    showToast("⏳ " + data.message, "info");
+                    pollImportJob(data.status_url);
                 } else {
                     showToast("❌ Error: " + data.error, "danger");
                 }
@@ -95,6 +262,31 @@ document.addEventListener("DOMContentLoaded", function () {
         });
     }
 
+    // Poll a queued import until the worker finishes it
+    function pollImportJob(statusUrl) {
+        fetch(statusUrl)
+            .then(res => res.json())
+            .then(job => {
+                if (job.status === "Done") {
+                    const summary = Object.entries(job.sheets)
+                        .map(([sheet, p]) => `${sheet}: ${p.inserted} new, ${p.updated} updated, ${p.skipped} unchanged`
+                            + (p.invalid ? `, ${p.invalid} rejected` : ""))
+                        .join(", ");
+                    const report = job.errors_url ? ` <a class="link-light" href="${job.errors_url}">Download rejected rows</a>` : "";
+                    showToast("✅ Import finished (" + summary + ")" + report, job.errors_url ? "warning" : "success");
+                } else if (job.status === "Failed") {
+                    const report = job.errors_url ? ` <a class="link-light" href="${job.errors_url}">Download rejected rows</a>` : "";
+                    showToast("❌ Import failed: " + job.error + report, "danger");
+                } else {
+                    setTimeout(() => pollImportJob(statusUrl), 1000);
+                }
+            })
+            .catch(err => {
+                console.error("Polling import failed:", err);
+                showToast("❌ Lost track of the import job.", "danger");
+            });
+    }
+
     // Bootstrap Toast helper
     function showToast(message, type = "info") {
         const toastContainer = document.createElement("div");
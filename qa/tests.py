@@ -1,3 +1,809 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import warnings
+import zipfile
+from datetime import date, datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import importer, instrumentation, metrics, partitions, refcache, search
+from .benchmarks import generate_workbook, reset_tables
+from .cache import check_shared_cache
+from .exporter import stream_export
+from .importer import (SHEETS, ErrorReport, _copy_blocks, import_workbook, normalize_dates, normalize_frame,
+                       safe_date, upsert)
+from .jobs import run_job
+from .results import ingest_results
+from .signals import row_scope
+from .models import (Sprint, UserStory, Defect, Effort, TestResult, ImportFingerprint, ImportJob, ImportJobStatus,
+                     SearchDocument)
+from .models import TestCase as Case
+
+
+class PartialQueryCountTests(TestCase):
+    """The partial tables must issue the same number of queries for 1 row as for many."""
+
+    urls = ["userstories", "defects", "testcases", "efforts"]
+
+    def setUp(self):
+        cache.clear()
+
+    def add_rows(self, n):
+        # Run the on-commit cache invalidation, as a real commit would.
+        with self.captureOnCommitCallbacks(execute=True):
+            sprint = Sprint.objects.create(name="Sprint", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+            for i in range(n):
+                story = UserStory.objects.create(sprint=sprint, title=f"Story {i}")
+                case = Case.objects.create(user_story=story, title=f"Case {i}")
+                Defect.objects.create(user_story=story, test_case=case, title=f"Defect {i}", status="Open")
+                Effort.objects.create(user_story=story, user="qa", effort_type="Testing", hours=1)
+
+    def count_queries(self, name):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_rows(1)
+        baseline = {name: self.count_queries(name) for name in self.urls}
+        self.add_rows(20)
+        for name in self.urls:
+            with self.subTest(view=name):
+                self.assertEqual(self.count_queries(name), baseline[name])
+
+
+class CachedViewTests(TestCase):
+    """Cached partials are served without queries and evicted only by writes that affect them."""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sprints = [
+                Sprint.objects.create(name=f"Sprint {i}", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+                for i in range(2)
+            ]
+            self.stories = [UserStory.objects.create(sprint=s, title=f"Story {i}") for i, s in enumerate(self.sprints)]
+
+    def get(self, sprint, **headers):
+        return self.client.get(reverse("defects"), {"sprint": sprint.pk}, headers=headers)
+
+    def add_defect(self, story, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            Defect.objects.create(user_story=story, title=title, description=title, status="Open")
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.get(self.sprints[0])
+        with self.assertNumQueries(0):
+            second = self.get(self.sprints[0])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_matching_etag_gets_not_modified(self):
+        etag = self.get(self.sprints[0])["ETag"]
+        self.assertEqual(self.get(self.sprints[0], if_none_match=etag).status_code, 304)
+
+    def test_write_evicts_only_affected_sprint(self):
+        self.get(self.sprints[0])
+        self.get(self.sprints[1])
+        self.add_defect(self.stories[1], "Only in sprint 1")
+        with self.assertNumQueries(0):
+            self.get(self.sprints[0])
+        self.assertContains(self.get(self.sprints[1]), "Only in sprint 1")
+
+    def test_moving_a_story_evicts_both_sprints(self):
+        self.add_defect(self.stories[0], "Moves with its story")
+        self.assertContains(self.get(self.sprints[0]), "Moves with its story")
+        self.get(self.sprints[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stories[0].sprint = self.sprints[1]
+            self.stories[0].save()
+        self.assertNotContains(self.get(self.sprints[0]), "Moves with its story")
+        self.assertContains(self.get(self.sprints[1]), "Moves with its story")
+
+    def test_cascade_delete_is_announced_once(self):
+        self.add_defect(self.stories[0], "Goes with its sprint")
+        Defect.objects.bulk_create(Defect(user_story=self.stories[0], title=f"Bug {i}") for i in range(1000))
+        Effort.objects.bulk_create(Effort(user_story=self.stories[0], user="qa", effort_type="Testing", hours=1)
+                                   for _ in range(1000))
+        gone = Sprint(pk=self.sprints[0].pk)
+        self.assertContains(self.get(gone), "Goes with its sprint")
+        self.get(self.sprints[1])
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            self.sprints[0].delete()
+        # About 20 of these are Django's 100-row DELETE batches; per-row receivers made it thousands.
+        self.assertLess(len(queries), 60)
+        self.assertFalse(SearchDocument.objects.filter(title__in=["Story 0", "Goes with its sprint"]).exists())
+        self.assertNotContains(self.get(gone), "Goes with its sprint")
+        with self.assertNumQueries(0):
+            self.get(self.sprints[1])
+
+    def test_process_local_cache_is_flagged(self):
+        self.assertEqual(check_shared_cache(None), [])
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            self.assertEqual([w.id for w in check_shared_cache(None)], ["qa.W001"])
+
+
+class PickerTests(TestCase):
+    """The home page is a shell; sprints and stories come from paginated, searchable lookups."""
+
+    def setUp(self):
+        cache.clear()
+        self.sprint = Sprint.objects.create(name="Alpha", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        other = Sprint.objects.create(name="Beta", start_date=date(2025, 1, 15), end_date=date(2025, 1, 28))
+        for i in range(3):
+            UserStory.objects.create(sprint=self.sprint, title=f"Login {i}")
+        UserStory.objects.create(sprint=other, title="Login elsewhere")
+        UserStory.objects.create(sprint=self.sprint, title="Checkout")
+
+    def test_home_does_not_query_stories(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse("home")).status_code, 200)
+
+    def test_story_lookup_filters_searches_and_pages(self):
+        url = reverse("userstories_for_sprint")
+        first = self.client.get(url, {"sprint_id": self.sprint.pk, "q": "login", "limit": 2})
+        self.assertEqual([s["title"] for s in first.json()], ["Login 0", "Login 1"])
+        rest = self.client.get(url, {"sprint_id": self.sprint.pk, "q": "login", "limit": 2,
+                                     "cursor": first["X-Next-Cursor"]})
+        self.assertEqual([s["title"] for s in rest.json()], ["Login 2"])
+        self.assertNotIn("X-Next-Cursor", rest)
+
+    def test_story_lookup_without_paging_returns_every_story(self):
+        UserStory.objects.bulk_create([UserStory(sprint=self.sprint, title=f"Bulk {i}") for i in range(150)])
+        stories = self.client.get(reverse("userstories_for_sprint"), {"sprint_id": self.sprint.pk}).json()
+        self.assertEqual(len(stories), 154)
+        self.assertEqual(set(stories[0]), {"id", "title"})
+
+    def test_sprint_lookup(self):
+        data = self.client.get(reverse("sprints_lookup"), {"q": "bet"}).json()
+        self.assertEqual([s["name"] for s in data], ["Beta"])
+
+
+class DashboardTests(TestCase):
+    """The dashboard returns the summary and every table of a sprint in one response."""
+
+    def setUp(self):
+        cache.clear()
+        self.sprint = Sprint.objects.create(name="Alpha", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        other = Sprint.objects.create(name="Beta", start_date=date(2025, 1, 15), end_date=date(2025, 1, 28))
+        story = UserStory.objects.create(sprint=self.sprint, title="Checkout")
+        UserStory.objects.create(sprint=other, title="Elsewhere")
+        for i in range(3):
+            Defect.objects.create(user_story=story, title=f"Bug {i}", description=f"Bug {i}", status="Open")
+        Case.objects.create(user_story=story, title="test_checkout")
+        Effort.objects.create(user_story=story, user="qa", effort_type="Testing", hours=2)
+
+    def test_tables_and_summary(self):
+        data = self.client.get(reverse("dashboard"), {"sprint": self.sprint.pk, "limit": 2}).json()
+        self.assertEqual(data["summary"]["defects_by_status"], {"Open": 3})
+        self.assertEqual({name: t["count"] for name, t in data["tables"].items()},
+                         {"userstories": 1, "defects": 3, "testcases": 1, "efforts": 1})
+        self.assertIn("Bug 1", data["tables"]["defects"]["html"])
+        self.assertNotIn("Bug 2", data["tables"]["defects"]["html"])
+        self.assertIsNotNone(data["tables"]["defects"]["next"])
+        self.assertNotIn("Elsewhere", data["tables"]["userstories"]["html"])
+
+    async def test_served_by_the_async_handler(self):
+        response = await self.async_client.get(reverse("dashboard"), {"sprint": self.sprint.pk})
+        self.assertEqual(response.json()["tables"]["testcases"]["count"], 1)
+        response = await self.async_client.get(reverse("defects"), {"sprint": self.sprint.pk})
+        self.assertContains(response, "Bug 2")
+
+    def test_bad_and_unknown_sprint(self):
+        self.assertEqual(self.client.get(reverse("dashboard"), {"sprint": "x"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("dashboard"), {"sprint": 999}).status_code, 404)
+
+
+class ApiTests(TestCase):
+    """The NDJSON API streams selected columns of filtered rows."""
+
+    def setUp(self):
+        sprint = Sprint.objects.create(name="Sprint", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        self.story = UserStory.objects.create(sprint=sprint, title="Story")
+        for hours in (1, 2, 3):
+            Effort.objects.create(user_story=self.story, user="qa", effort_type="Testing", hours=hours)
+
+    def rows(self, resource, **params):
+        response = self.client.get(reverse("api_rows", args=[resource]), params)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        body = b"".join(response.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_fields_and_filters(self):
+        rows = self.rows("efforts", fields="hours,user_story_id", hours__gte="2")
+        self.assertEqual(rows, [{"hours": 2.0, "user_story_id": self.story.pk},
+                                {"hours": 3.0, "user_story_id": self.story.pk}])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(reverse("api_rows", args=["efforts"]), {"fields": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("api_rows", args=["efforts"]), {"hours__regex": "1"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("api_rows", args=["nothing"])).status_code, 404)
+
+    async def test_asgi_streams_without_buffering(self):
+        for url in (reverse("api_rows", args=["efforts"]), reverse("export_data") + "?format=csv"):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertTrue(response.is_async)
+                self.assertTrue([part async for part in response.streaming_content])
+
+
+class CsvBundleRoundTripTests(TestCase):
+    """A CSV export imports back through the same sheet contract."""
+
+    def test_export_then_import(self):
+        sprint = Sprint.objects.create(name="Sprint", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        story = UserStory.objects.create(sprint=sprint, title="Story", description="tab\there, \"quoted\"")
+        Effort.objects.create(user_story=story, user="qa", effort_type="Testing", hours=1.5)
+        bundle = io.BytesIO(b"".join(stream_export("csv")))
+        bundle.name = "export.zip"
+
+        UserStory.objects.filter(pk=story.pk).update(description="changed")
+        stats = import_workbook(bundle)
+
+        counts = {k: stats["userstories"][k] for k in ("inserted", "updated", "skipped")}
+        self.assertEqual(counts, {"inserted": 0, "updated": 1, "skipped": 0})
+        self.assertEqual(UserStory.objects.get(pk=story.pk).description, "tab\there, \"quoted\"")
+        # Zip64 entries, so a sheet past 2 GiB still fits.
+        self.assertTrue(all(info.extract_version >= zipfile.ZIP64_VERSION
+                            for info in zipfile.ZipFile(bundle).infolist()))
+
+
+class WorkbookImportTests(TestCase):
+    """A generated workbook, with blank cells and dangling keys, imports the same way on every path."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.tmp.cleanup)
+        cls.path = os.path.join(cls.tmp.name, "workbook.xlsx")
+        cls.counts = generate_workbook(cls.path, 400)
+
+    def load(self, source=None, **options):
+        """Import into empty tables; returns the stats without timings and every imported row."""
+        reset_tables()
+        refcache.clear_all()
+        stats = import_workbook(source or self.path, **options)
+        for counts in stats.values():
+            del counts["timings"]
+        rows = {sheet: list(spec.model.objects.order_by("id").values_list(*spec.columns))
+                for sheet, spec in SHEETS.items()}
+        return stats, rows
+
+    def test_every_sheet_is_written(self):
+        stats, rows = self.load()
+        for sheet, count in self.counts.items():
+            self.assertEqual(stats[sheet]["inserted"] + stats[sheet]["invalid"], count)
+            self.assertEqual(len(rows[sheet]), stats[sheet]["inserted"])
+        # Dangling story ids in the generated sheets are rejected, not written.
+        self.assertGreater(stats["efforts"]["invalid"], 0)
+        again = import_workbook(self.path)
+        self.assertEqual([again[sheet]["updated"] for sheet in SHEETS], [stats[sheet]["inserted"] for sheet in SHEETS])
+
+    def test_streamed_import_matches_whole_sheets(self):
+        whole = self.load()
+        for chunk_rows in (1, 37, 1000):
+            with self.subTest(chunk_rows=chunk_rows):
+                self.assertEqual(self.load(chunk_rows=chunk_rows), whole)
+
+    def test_parallel_parsing_matches_serial(self):
+        with mock.patch("qa.importer.read_sheets_parallel", wraps=importer.read_sheets_parallel) as parallel:
+            self.assertEqual(self.load(jobs=3), self.load())
+        self.assertEqual(parallel.call_count, 1)
+
+    def test_load_sample_data_options(self):
+        stats, rows = self.load()
+        reset_tables()
+        rejected = os.path.join(self.tmp.name, "rejected.csv")
+        out = io.StringIO()
+        call_command("load_sample_data", file=self.path, batch_size=50, chunk_rows=100, errors=rejected, stdout=out)
+        self.assertEqual({sheet: spec.model.objects.count() for sheet, spec in SHEETS.items()},
+                         {sheet: len(r) for sheet, r in rows.items()})
+        with open(rejected, newline="") as fh:
+            report = list(csv.DictReader(fh))
+        self.assertEqual(len({(r["sheet"], r["row"]) for r in report}), sum(c["invalid"] for c in stats.values()))
+        self.assertIn(f"see {rejected}", out.getvalue())
+
+        out = io.StringIO()
+        call_command("load_sample_data", file=self.path, incremental=True, stdout=out)
+        call_command("load_sample_data", file=self.path, incremental=True, stdout=out)
+        self.assertIn(f"Loaded efforts: 0 inserted, 0 updated, {stats['efforts']['inserted']} unchanged", out.getvalue())
+
+    def test_queries_do_not_grow_with_rows(self):
+        small = os.path.join(self.tmp.name, "small.xlsx")
+        generate_workbook(small, 40)
+        queries = []
+        for path in (small, self.path):
+            reset_tables()
+            refcache.clear_all()
+            with CaptureQueriesContext(connection) as captured:
+                import_workbook(path)
+            queries.append(len(captured))
+        # Ten times the rows; only SQLite's parameter limit splits a few more INSERTs.
+        self.assertLess(queries[1], queries[0] * 1.5)
+
+
+class UpsertTests(TestCase):
+    """upsert writes new and existing rows together, one statement per batch; scope lookups are batched too."""
+
+    def test_one_statement_per_batch(self):
+        Sprint.objects.create(id=2, name="Old", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        objs = [Sprint(id=pk, name=f"Sprint {pk}", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+                for pk in range(1, 6)]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(upsert(Sprint, objs, ["name", "start_date", "end_date"], batch_size=2), (4, 1))
+        writes = [q["sql"] for q in queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+        self.assertEqual(len(writes), 3)
+        self.assertTrue(all("ON CONFLICT" in sql for sql in writes))
+        self.assertEqual(Sprint.objects.get(id=2).name, "Sprint 2")
+
+    def test_scope_is_looked_up_per_batch(self):
+        sprint = Sprint.objects.create(name="Sprint", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        stories = [UserStory.objects.create(sprint=sprint, title=f"Story {i}") for i in range(2)]
+        efforts = Effort.objects.bulk_create(Effort(user_story=stories[i % 2], user="qa", effort_type="Testing",
+                                                    hours=1) for i in range(5))
+        with self.assertNumQueries(3):
+            scope = row_scope(Effort, [e.pk for e in efforts], batch_size=2)
+        self.assertEqual(scope, ({s.pk for s in stories}, {sprint.pk}))
+
+
+class ValidationTests(TestCase):
+    """Bad rows are reported line by line and the rest of the sheet is still written."""
+
+    DEFECTS = (b"id,user_story_id,title,status,severity\n"
+               b"1,{story},Fine,Open,Major\n"
+               b"2,{story},Typo,Opne,Major\n"
+               b"3,999,Orphan,Open,Huge\n"
+               b",{story},No id,Open,Minor\n")
+
+    def setUp(self):
+        cache.clear()
+        sprint = Sprint.objects.create(name="Sprint", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        self.story = UserStory.objects.create(sprint=sprint, title="Story")
+
+    def upload(self):
+        source = io.BytesIO(self.DEFECTS.replace(b"{story}", str(self.story.pk).encode()))
+        source.name = "defects.csv"
+        return source
+
+    def test_valid_rows_are_written_and_the_rest_reported(self):
+        for chunk_rows in (None, 2):
+            out = io.StringIO()
+            stats = import_workbook(self.upload(), chunk_rows=chunk_rows, errors=ErrorReport(out))
+            self.assertEqual(stats["defects"]["invalid"], 3)
+            self.assertEqual(list(Defect.objects.values_list("title", flat=True)), ["Fine"])
+            report = [(r["row"], r["column"], r["value"]) for r in csv.DictReader(io.StringIO(out.getvalue()))]
+            self.assertEqual(report, [("3", "status", "Opne"), ("4", "severity", "Huge"),
+                                      ("4", "user_story_id", "999"), ("5", "id", "")])
+
+    def test_ids_and_foreign_keys_that_are_not_integers_are_reported(self):
+        source = io.BytesIO(b"id,user_story_id,title,status,severity\n"
+                            b"1,US-12,Typo,Open,Major\n"
+                            b"2,2.5,Fraction,Open,Major\n"
+                            b"3.5,,Fractional id,Open,Major\n"
+                            b"4,,Unassigned,Open,Major\n")
+        source.name = "defects.csv"
+        out = io.StringIO()
+        stats = import_workbook(source, errors=ErrorReport(out))
+        self.assertEqual((stats["defects"]["inserted"], stats["defects"]["invalid"]), (1, 3))
+        self.assertEqual(Defect.objects.get().user_story_id, None)
+        report = [(r["row"], r["column"], r["value"], r["error"]) for r in csv.DictReader(io.StringIO(out.getvalue()))]
+        self.assertEqual(report, [("2", "user_story_id", "US-12", "user_story_id is not an integer"),
+                                  ("3", "user_story_id", "2.5", "user_story_id is not an integer"),
+                                  ("4", "id", "3.5", "id is missing or not an integer")])
+
+    def test_job_keeps_a_downloadable_report(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            job = ImportJob(file=ContentFile(self.upload().getvalue(), name="defects.csv"))
+            job.save()
+            run_job(job)
+            self.assertEqual(job.status, ImportJobStatus.DONE)
+            status = self.client.get(reverse("import_job", args=[job.pk])).json()
+            self.assertEqual(status["sheets"]["defects"]["invalid"], 3)
+            response = self.client.get(status["errors_url"])
+            self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 5)
+            response.close()
+
+    def test_queued_uploads_with_one_name_keep_their_sheet_name(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            jobs = [ImportJob(file=ContentFile(self.upload().getvalue(), name="defects.csv")) for _ in range(2)]
+            for job in jobs:
+                job.save()
+            for job in jobs:
+                self.assertEqual(run_job(job).status, ImportJobStatus.DONE)
+
+
+class ImportWorkerTests(TestCase):
+    """The worker can put back jobs left running by a worker that died."""
+
+    def test_stale_running_jobs_are_requeued(self):
+        source = b"id,name,start_date,end_date\n1,A,2025-01-01,2025-01-14\n"
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            stale, live = (ImportJob.objects.create(file=ContentFile(source, name="sprints.csv"),
+                                                    status=ImportJobStatus.RUNNING,
+                                                    started_at=timezone.now() - timedelta(minutes=minutes))
+                           for minutes in (120, 5))
+            call_command("run_import_worker", once=True, requeue_stale=60, stdout=io.StringIO())
+            stale.refresh_from_db()
+            live.refresh_from_db()
+            self.assertEqual((stale.status, live.status), (ImportJobStatus.DONE, ImportJobStatus.RUNNING))
+            self.assertTrue(Sprint.objects.filter(pk=1).exists())
+
+
+class LoggedAtImportTests(TestCase):
+    """An effort's logged_at comes from the sheet; blank cells stamp new rows and keep stored ones."""
+
+    def setUp(self):
+        sprint = Sprint.objects.create(name="Sprint", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        self.story = UserStory.objects.create(sprint=sprint, title="Story")
+
+    def efforts(self, *rows, incremental=False):
+        lines = ["id,user_story_id,user_name,effort_type,hours,logged_at"]
+        lines += [f"{pk},{self.story.pk},qa,Testing,1,{logged_at}" for pk, logged_at in rows]
+        source = io.BytesIO("\n".join(lines).encode())
+        source.name = "efforts.csv"
+        return import_workbook(source, incremental=incremental)["efforts"]
+
+    def logged(self, pk):
+        return timezone.localtime(Effort.objects.get(pk=pk).logged_at).replace(tzinfo=None)
+
+    def test_sheet_value_is_written_on_insert_and_update(self):
+        before = timezone.now()
+        self.efforts((1, "2020-03-04 10:00"), (2, ""))
+        self.assertEqual(self.logged(1), datetime(2020, 3, 4, 10))
+        self.assertGreaterEqual(Effort.objects.get(pk=2).logged_at, before)
+        self.efforts((1, "2021-05-06 07:00"))
+        self.assertEqual(self.logged(1), datetime(2021, 5, 6, 7))
+
+    def test_blank_cell_keeps_the_stored_value(self):
+        self.efforts((1, "2020-03-04 10:00"))
+        self.efforts((1, ""))
+        self.assertEqual(self.logged(1), datetime(2020, 3, 4, 10))
+
+    def test_sheet_values_are_written_aware(self):
+        # Naive datetimes make Django warn once per row.
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            self.efforts((1, "2020-03-04 10:00"), (2, "2020-03-05 10:00"))
+            self.efforts((1, "2020-03-04 11:00"), incremental=True)
+        self.assertEqual(self.logged(1), datetime(2020, 3, 4, 11))
+
+    def test_incremental_import_sees_logged_at_edits(self):
+        self.efforts((1, "2020-03-04 10:00"), incremental=True)
+        self.assertEqual(self.efforts((1, ""), incremental=True)["skipped"], 1)
+        self.assertEqual(self.efforts((1, "2020-03-05 10:00"), incremental=True)["updated"], 1)
+        self.assertEqual(self.logged(1), datetime(2020, 3, 5, 10))
+
+
+class IncrementalImportTests(TestCase):
+    """Incremental imports skip unchanged sheets and rows, and notice writes made any other way."""
+
+    def sprints(self, *names, incremental=True, chunk_rows=None):
+        lines = ["id,name,start_date,end_date"]
+        lines += [f"{pk},{name},2025-01-01,2025-01-14" for pk, name in enumerate(names, 1)]
+        source = io.BytesIO("\n".join(lines).encode())
+        source.name = "sprints.csv"
+        stats = import_workbook(source, incremental=incremental, chunk_rows=chunk_rows)["sprints"]
+        return stats["inserted"], stats["updated"], stats["skipped"]
+
+    def test_unchanged_sheet_is_skipped(self):
+        self.assertEqual(self.sprints("A", "B"), (2, 0, 0))
+        self.assertTrue(ImportFingerprint.objects.filter(sheet="sprints").exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.sprints("A", "B"), (0, 0, 2))
+        self.assertFalse([q for q in queries if Sprint._meta.db_table in q["sql"]])
+
+    def test_changed_rows_are_diffed_row_by_row(self):
+        self.sprints("A", "B")
+        self.assertEqual(self.sprints("A", "C"), (0, 1, 1))
+        self.assertEqual(self.sprints("A", "C", chunk_rows=1), (0, 0, 2))
+
+    def test_saves_and_deletes_drop_the_fingerprint(self):
+        self.sprints("A", "B")
+        sprint = Sprint.objects.get(pk=2)
+        sprint.name = "X"
+        sprint.save()
+        self.assertFalse(ImportFingerprint.objects.exists())
+        self.assertEqual(self.sprints("A", "B"), (0, 1, 1))
+        Sprint.objects.filter(pk=1).delete()
+        self.assertFalse(ImportFingerprint.objects.exists())
+        self.assertEqual(self.sprints("A", "B"), (1, 0, 1))
+
+    def test_unchanged_rows_are_read_in_batches(self):
+        self.sprints("A", "B", "C")
+        frame = normalize_frame(SHEETS["sprints"], pd.DataFrame(
+            {"id": [1, 2, 3], "name": ["A", "X", "C"], "start_date": ["2025-01-01"] * 3,
+             "end_date": ["2025-01-14"] * 3, "goal": [None] * 3}))
+        with self.assertNumQueries(2):
+            changed, unchanged = importer.drop_unchanged(SHEETS["sprints"], frame, batch_size=2)
+        self.assertEqual((changed["id"].tolist(), unchanged), ([2], 2))
+
+    def test_plain_import_drops_the_fingerprint(self):
+        self.sprints("A", "B")
+        self.assertEqual(self.sprints("C", "D", incremental=False), (0, 2, 0))
+        self.assertFalse(ImportFingerprint.objects.exists())
+        self.assertEqual(self.sprints("A", "B"), (0, 2, 0))
+
+
+class DateNormalizationTests(TestCase):
+    """normalize_dates gives what safe_date gives cell by cell, edge values included."""
+
+    COLUMNS = [
+        [45000, 45000.5, 1, 0, None],
+        [20250105, 1e20, -700000, 2958465, 2958466, -693593, float("inf")],
+        ["2025-01-05", "2025-01-05 10:30", "20250105", "0001-01-01", "9999-12-31 23:59", "10000-01-01", "x", ""],
+        [pd.Timestamp("2020-01-01"), datetime(2021, 2, 3, 4, 5), 45000, 20250105, "2022-06-07", "x", None],
+    ]
+
+    def test_matches_safe_date(self):
+        for values in self.COLUMNS:
+            for only_date in (False, True):
+                with self.subTest(values=values, only_date=only_date):
+                    # safe_date("") gives NaT; the column-wise None is what the database stores.
+                    expected = [None if pd.isna(d) else d for d in (safe_date(v, only_date=only_date) for v in values)]
+                    self.assertEqual(normalize_dates(pd.Series(values), only_date=only_date).tolist(), expected)
+
+    def test_rows_keep_their_index(self):
+        # Streamed chunks and sheets with blank rows do not start at 0.
+        series = pd.Series([datetime(2024, 1, 1, 9), None, "2024-01-02"], index=[37, 38, 40])
+        self.assertEqual(normalize_dates(series).tolist(), [datetime(2024, 1, 1, 9), None, datetime(2024, 1, 2)])
+        series = pd.Series(pd.to_datetime(["2024-01-01 09:00", "2024-01-02 00:00"]), index=[5, 7])
+        self.assertEqual(normalize_dates(series).to_dict(), {5: datetime(2024, 1, 1, 9), 7: datetime(2024, 1, 2)})
+
+    def test_out_of_range_serial_does_not_abort_the_import(self):
+        source = io.BytesIO(b"id,name,start_date,end_date\n1,A,20250105,45000\n2,B,45000,45010\n")
+        source.name = "sprints.csv"
+        stats = import_workbook(source)["sprints"]
+        self.assertEqual((stats["inserted"], stats["invalid"]), (1, 1))
+
+
+class CopyEncodingTests(TestCase):
+    """COPY text for integer columns has no float formatting, even when pandas read them as floats."""
+
+    def test_blank_cells_do_not_turn_integers_into_floats(self):
+        raw = pd.read_csv(io.StringIO("id,sprint_id,title,story_points\n1,1,A,5\n2,,B,\n3,1,C,8\n"))
+        frame = normalize_frame(SHEETS["userstories"], raw)
+        attrs = ["id", "sprint_id", "story_points", "title"]
+        text = "".join(_copy_blocks(frame, attrs, integers={"id", "sprint_id", "story_points"}))
+        self.assertEqual(text.splitlines(), ["1\t1\t5\tA", "2\t\\N\t\\N\tB", "3\t1\t8\tC"])
+
+
+class CopyMergeTests(TestCase):
+    """copy_upsert merges in one statement, or under a table lock where ON CONFLICT is unavailable."""
+
+    def statements(self, partitioned):
+        frame = normalize_frame(SHEETS["sprints"], pd.DataFrame(
+            {"id": [1], "name": ["A"], "start_date": ["2025-01-01"], "end_date": ["2025-01-14"], "goal": [None]}))
+        fake = mock.MagicMock()
+        fake.ops.quote_name = lambda name: f'"{name}"'
+        cursor = fake.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (1, 1)
+        with mock.patch("qa.importer.connection", fake), \
+                mock.patch("qa.importer.is_partitioned", return_value=partitioned):
+            importer.copy_upsert(Sprint, frame, SHEETS["sprints"].fields)
+        return [c.args[0] for c in cursor.execute.call_args_list]
+
+    def test_tables_with_a_unique_id_merge_with_on_conflict(self):
+        sql = self.statements(partitioned=False)
+        self.assertEqual(len([s for s in sql if s.startswith("WITH merged AS (INSERT")]), 1)
+        self.assertIn('ON CONFLICT ("id") DO UPDATE', sql[1])
+        self.assertFalse([s for s in sql if s.startswith(("UPDATE", "LOCK"))])
+
+    def test_partitioned_tables_merge_under_a_lock(self):
+        sql = self.statements(partitioned=True)
+        self.assertEqual(sql[1], 'LOCK TABLE "qa_sprint" IN SHARE ROW EXCLUSIVE MODE')
+        self.assertTrue(sql[2].startswith("UPDATE") and sql[3].startswith("INSERT"))
+
+    def test_only_the_temporary_staging_table_is_dropped(self):
+        sql = self.statements(partitioned=False)
+        self.assertEqual([s for s in sql if s.startswith("DROP")], ["DROP TABLE pg_temp.qa_stage"])
+
+
+class ResultIngestionTests(TestCase):
+    """CI results are matched to test cases by id or title and bulk inserted."""
+
+    def setUp(self):
+        self.sprint = Sprint.objects.create(name="Sprint", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        story = UserStory.objects.create(sprint=self.sprint, title="Story")
+        self.login = Case.objects.create(user_story=story, title="test_login")
+        self.logout = Case.objects.create(user_story=story, title="test_logout")
+
+    def post(self, body, content_type, **params):
+        url = reverse("ingest_test_results")
+        if params:
+            url += "?" + "&".join(f"{k}={v}" for k, v in params.items())
+        return self.client.post(url, body, content_type=content_type)
+
+    def test_junit(self):
+        report = f"""<testsuites><testsuite name="suite">
+            <testcase name="test_login"/>
+            <testcase name="renamed"><properties><property name="test_case_id" value="{self.logout.pk}"/></properties>
+                <failure message="boom"/></testcase>
+            <testcase name="test_unknown"><skipped/></testcase>
+        </testsuite></testsuites>"""
+        data = self.post(report, "application/xml", environment="ci").json()
+        self.assertEqual((data["received"], data["inserted"], data["unmatched"]), (3, 2, 1))
+        self.assertEqual(
+            sorted(TestResult.objects.values_list("test_case_id", "result", "environment")),
+            sorted([(self.login.pk, "Pass", "ci"), (self.logout.pk, "Fail", "ci")]))
+
+    def test_ndjson(self):
+        lines = [
+            {"test_case": "test_login", "result": "passed"},
+            {"test_case_id": self.logout.pk, "result": "BLOCKED", "environment": "staging"},
+            {"test_case": "test_login", "result": "flaky"},
+        ]
+        data = self.post("\n".join(json.dumps(line) for line in lines), "application/x-ndjson").json()
+        self.assertEqual((data["inserted"], data["invalid"]), (2, 1))
+        self.assertEqual(TestResult.objects.get(test_case=self.logout).environment, "staging")
+
+    def test_malformed_payload(self):
+        self.assertEqual(self.post("<testsuite>", "application/xml").status_code, 400)
+
+    def test_summary_is_refreshed_once_per_ingestion(self):
+        rows = [{"test_case": "test_login", "result": result} for result in ("pass", "fail", "pass")]
+        # Batches commit one by one outside tests, so every scheduled flush would run.
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ingest_results(rows, batch_size=1)
+        self.assertEqual(callbacks.count(metrics._flush_pending), 1)
+        self.assertEqual(metrics.sprint_summary(self.sprint.pk)["results"], {"Pass": 2, "Fail": 1})
+
+
+class RetentionTests(TestCase):
+    """Without partitions, retention deletes old rows in batches and refuses to archive."""
+
+    def setUp(self):
+        self.sprint = Sprint.objects.create(name="Sprint", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        story = UserStory.objects.create(sprint=self.sprint, title="Story")
+        case = Case.objects.create(user_story=story, title="test_login")
+        TestResult.objects.bulk_create([TestResult(test_case=case, result="Pass") for _ in range(5)])
+        Effort.objects.bulk_create([Effort(user_story=story, user="qa", effort_type="Testing", hours=1,
+                                           logged_at=timezone.now() - timedelta(days=days)) for days in (0, 400)])
+        old = timezone.now() - timedelta(days=400)
+        TestResult.objects.filter(id__in=list(TestResult.objects.values_list("id", flat=True)[:3])).update(
+            executed_at=old)
+
+    def test_old_rows_are_deleted_in_batches(self):
+        with CaptureQueriesContext(connection) as queries, mock.patch("qa.receivers.schedule_refresh") as refresh:
+            done = partitions.apply_retention(TestResult, 12, batch_size=2)
+        self.assertEqual(done, ["deleted 3 rows from qa_testresult"])
+        self.assertEqual(TestResult.objects.count(), 2)
+        deletes = [q["sql"] for q in queries if q["sql"].startswith("DELETE")]
+        self.assertEqual(len([sql for sql in deletes if "qa_testresult" in sql]), 2)
+        refresh.assert_called_once_with({self.sprint.pk})
+
+    def test_command_deletes_and_refuses_to_archive(self):
+        out = io.StringIO()
+        call_command("manage_partitions", "retain", "--months", "12", stdout=out)
+        self.assertEqual((TestResult.objects.count(), Effort.objects.count()), (2, 1))
+        self.assertIn("deleted 1 rows from qa_effort", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "not partitioned"):
+            call_command("manage_partitions", "retain", "--months", "12", "--archive", stdout=out)
+
+
+class RefCacheTests(TestCase):
+    """Foreign key checks reuse the rows they found until the referenced model is written."""
+
+    def setUp(self):
+        cache.clear()
+        refcache.clear_all()
+        self.sprint = Sprint.objects.create(name="Alpha", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        story = UserStory.objects.create(sprint=self.sprint, title="Checkout")
+        self.case = Case.objects.create(user_story=story, title="test_checkout")
+
+    def test_repeat_lookups_skip_the_database(self):
+        self.assertEqual(refcache.existing_ids(Sprint, [self.sprint.pk, 999]), {self.sprint.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(refcache.existing_ids(Sprint, [self.sprint.pk]), {self.sprint.pk})
+
+    def test_missing_rows_are_looked_up_again(self):
+        self.assertEqual(refcache.existing_ids(Sprint, [self.sprint.pk, 999]), {self.sprint.pk})
+        # bulk_create sends no signal, like a write whose token has not reached this process.
+        Sprint.objects.bulk_create([Sprint(id=999, name="Late", start_date=date(2025, 2, 1),
+                                           end_date=date(2025, 2, 14))])
+        self.assertEqual(refcache.existing_ids(Sprint, [self.sprint.pk, 999]), {self.sprint.pk, 999})
+
+    def test_writes_drop_cached_answers(self):
+        self.assertEqual(refcache.existing_ids(Sprint, [999]), set())
+        Sprint.objects.create(id=999, name="Late", start_date=date(2025, 2, 1), end_date=date(2025, 2, 14))
+        self.assertEqual(refcache.existing_ids(Sprint, [999]), {999})
+
+    def test_repeat_ingestion_reuses_test_case_lookups(self):
+        rows = [{"test_case_id": self.case.pk, "result": "pass"}, {"test_case": "test_checkout", "result": "fail"}]
+        with CaptureQueriesContext(connection) as first:
+            ingest_results(rows)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(ingest_results(rows)["inserted"], 2)
+        self.assertEqual(len(first) - len(second), 2)
+
+
+class SearchTests(TestCase):
+    """Search finds rows by their words, ranks title matches first and follows edits and deletes."""
+
+    def setUp(self):
+        sprint = Sprint.objects.create(name="Sprint", start_date=date(2025, 1, 1), end_date=date(2025, 1, 14))
+        self.story = UserStory.objects.create(sprint=sprint, title="Checkout flow",
+                                              description="Payment page crashes on submit")
+        self.defect = Defect.objects.create(user_story=self.story, title="Payment crash",
+                                            description="Crashes when the card is declined")
+
+    def search(self, q, **params):
+        return self.client.get(reverse("search"), {"q": q, **params}).json()
+
+    def test_ranked_results(self):
+        hits = self.search("payment crashes")["results"]
+        self.assertEqual([(h["kind"], h["id"]) for h in hits],
+                         [("defect", self.defect.pk), ("userstory", self.story.pk)])
+
+    def test_kind_filter_and_paging(self):
+        data = self.search("payment", kind="userstory", limit=1)
+        self.assertEqual([h["id"] for h in data["results"]], [self.story.pk])
+        self.assertIsNone(data["next"])
+        self.assertIsNotNone(self.search("payment", limit=1)["next"])
+
+    def test_index_follows_writes(self):
+        self.defect.title = "Declined cards"
+        self.defect.description = ""
+        self.defect.save()
+        self.assertEqual(self.search("declined")["results"][0]["id"], self.defect.pk)
+        self.story.delete()
+        self.assertEqual(self.search("declined")["results"], [])
+
+    def test_reindexing_skips_unchanged_text(self):
+        Defect.objects.bulk_create(Defect(user_story=self.story, title=f"Bug {i}") for i in range(5))
+        ids = list(Defect.objects.values_list("id", flat=True))
+        search.index_objects(Defect, ids, batch_size=2)
+        self.assertEqual(len(self.search("bug", limit=10)["results"]), 5)
+        with CaptureQueriesContext(connection) as queries:
+            search.index_objects(Defect, ids, batch_size=2)
+        # Per batch of two: read the rows, read their documents, nothing written.
+        self.assertEqual([q["sql"].split()[0] for q in queries if "SAVEPOINT" not in q["sql"]], ["SELECT"] * 6)
+
+    def test_migrate_adds_the_postgresql_vector(self):
+        for vendor, calls in (("sqlite", 0), ("postgresql", 1)):
+            with mock.patch("qa.receivers.connections", {"default": mock.Mock(vendor=vendor)}), \
+                    mock.patch("qa.receivers.ensure_vector") as ensure:
+                emit_post_migrate_signal(0, False, "default")
+            self.assertEqual(ensure.call_count, calls)
+
+
+@mock.patch("qa.instrumentation.INSTRUMENTATION", True)
+class InstrumentationTests(TestCase):
+    """With instrumentation on, requests carry Server-Timing and land in the local report."""
+
+    def setUp(self):
+        cache.clear()
+        instrumentation.history.clear()
+
+    def test_server_timing_and_report(self):
+        response = self.client.get(reverse("defects"))
+        timing = response["Server-Timing"]
+        self.assertIn('db;dur=', timing)
+        self.assertIn("render;dur=", timing)
+        report = self.client.get(reverse("instrumentation")).json()
+        self.assertEqual([r["path"] for r in report["requests"]], [reverse("defects")])
+        self.assertEqual(report["requests"][0]["queries"], 1)
+        self.assertEqual(report["paths"][reverse("defects")]["requests"], 1)
+
+    async def test_async_requests_count_worker_thread_queries(self):
+        response = await self.async_client.get(reverse("dashboard"))
+        self.assertIn('db;dur=', response["Server-Timing"])
+        self.assertGreaterEqual(instrumentation.history[-1]["queries"], 8)
+
+    def test_report_is_local_only(self):
+        self.assertEqual(self.client.get(reverse("instrumentation"), REMOTE_ADDR="10.0.0.5").status_code, 404)
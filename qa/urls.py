@@ -9,5 +9,15 @@ urlpatterns = [
     path("testcases/", views.testcases_view, name="testcases"),
     path("efforts/", views.efforts_view, name="efforts"),
     path("userstories-for-sprint/", views.userstories_for_sprint, name="userstories_for_sprint"),
+    path("sprints/", views.sprints_lookup, name="sprints_lookup"),
+    path("search/", views.search_view, name="search"),
+    path("instrumentation/", views.instrumentation_report, name="instrumentation"),
+    path("dashboard/", views.dashboard, name="dashboard"),
+    path("metrics/", views.sprint_metrics, name="sprint_metrics"),
+    path("api/<str:resource>/", views.api_rows, name="api_rows"),
+    path("export/", views.export_data, name="export_data"),
+    path("results/", views.ingest_test_results, name="ingest_test_results"),
     path("upload/", views.upload_file, name="upload_file"),
+    path("upload/<int:job_id>/", views.import_job, name="import_job"),
+    path("upload/<int:job_id>/errors.csv", views.import_job_errors, name="import_job_errors"),
 ]
@@ -1,210 +1,314 @@
-import pandas as pd
+import asyncio
+
+from asgiref.sync import sync_to_async
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.utils.dateparse import parse_datetime
-from django.shortcuts import render
-from .models import Sprint, UserStory, Defect, TestCase, Effort, DefectStatus, Comment, TestResult
-from django.http import JsonResponse, HttpResponse
-from datetime import datetime
+from django.shortcuts import render, get_object_or_404
+from django.template.loader import render_to_string
+from .models import Sprint, UserStory, Defect, TestCase, Effort, DefectStatus, Comment, TestResult, ImportJob, SprintSummary
+from django.http import (JsonResponse, HttpResponse, HttpResponseBadRequest, Http404, StreamingHttpResponse,
+                         FileResponse)
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
+from django.conf import settings
+from django.urls import reverse
+from .api import RESOURCES, build_query, stream_rows
+from .cache import cached_view
+from .exporter import FORMATS, stream_export
+from . import instrumentation
+from .instrumentation import timed
+from .jobs import enqueue
+from .metrics import sprint_summary, summary_dict
+from .results import ingest_results, parse_junit, parse_ndjson
+from .search import search
+
+PAGE_SIZE = getattr(settings, "QA_PAGE_SIZE", 100)
+MAX_PAGE_SIZE = 500
+
+
+async def paginate(request, qs):
+    """Keyset pagination on ``id``.
+
+    ``cursor`` is the last id the client has seen and ``limit`` the page
+    size. Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the
+    last page. Cost stays flat however deep the client scrolls.
+    """
+    limit = min(max(int(request.GET.get("limit") or PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    qs = qs.order_by("id")
+    cursor = request.GET.get("cursor")
+    if cursor:
+        qs = qs.filter(id__gt=int(cursor))
+    rows = [row async for row in qs[:limit + 1].aiterator()]
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+async def render_page(request, qs, template, name):
+    """Render one page of ``qs`` into a partial; the next cursor goes in ``X-Next-Cursor``.
+
+    Requests that carry a ``cursor`` get only the table rows, for appending.
+    """
+    try:
+        rows, next_cursor = await paginate(request, qs)
+    except ValueError:
+        return HttpResponseBadRequest("cursor and limit must be integers")
+    with timed("render"):
+        response = render(request, template, {
+            name: rows,
+            "append": bool(request.GET.get("cursor")),
+            "next_cursor": next_cursor,
+        })
+    if next_cursor is not None:
+        response["X-Next-Cursor"] = str(next_cursor)
+    return response
+
+
+async def picker_page(request, qs, field):
+    """``{"id", field}`` options for a picker as a JSON array, optionally narrowed by ``q``.
+
+    With ``limit`` or ``cursor`` only one page is returned, paginated like
+    the tables, and the next cursor goes in ``X-Next-Cursor``. Without them
+    every row is returned, which is what existing API clients expect.
+    """
+    q = request.GET.get("q", "").strip()
+    qs = qs.only("id", field)
+    if q:
+        qs = qs.filter(**{f"{field}__icontains": q})
+    next_cursor = None
+    if request.GET.get("limit") or request.GET.get("cursor"):
+        try:
+            rows, next_cursor = await paginate(request, qs)
+        except ValueError:
+            return HttpResponseBadRequest("cursor and limit must be integers")
+    else:
+        rows = [row async for row in qs.order_by("id").aiterator()]
+    response = JsonResponse([{"id": row.id, field: getattr(row, field)} for row in rows], safe=False)
+    if next_cursor is not None:
+        response["X-Next-Cursor"] = str(next_cursor)
+    return response
+
+
+# Columns each table partial shows; shared by the table views and the dashboard.
+def userstory_rows():
+    return UserStory.objects.select_related("sprint").only("id", "title", "description", "status", "sprint__name")
+
+def defect_rows():
+    return Defect.objects.only("id", "test_case", "description", "status", "assigned_to", "reported_by")
+
+def testcase_rows():
+    return TestCase.objects.only("id", "title", "description", "created_by")
+
+def effort_rows():
+    return Effort.objects.select_related("user_story").only("id", "user", "effort_type", "hours", "user_story__title")
 
 
 def home(request):
+    # Sprint and story pickers load on demand, so the shell costs the same however much data exists.
     return render(request, "home.html", {
-        "sprints": Sprint.objects.all(),
-        "all_stories": UserStory.objects.all(),
         "defect_status": DefectStatus.values,
     })
 
-def userstories_view(request):
+@cached_view("userstory", sprint_param="sprint")
+async def userstories_view(request):
     sprint_id = request.GET.get("sprint")
-    qs = UserStory.objects.all()
+    qs = userstory_rows()
     if sprint_id:
         qs = qs.filter(sprint_id=sprint_id)
-    return render(request, "qa/partials/userstories_table.html", {"userstories": qs})
+    return await render_page(request, qs, "qa/partials/userstories_table.html", "userstories")
 
-def defects_view(request):
+@cached_view("defect", sprint_param="sprint", story_param="user_story")
+async def defects_view(request):
     sprint_id = request.GET.get("sprint")
     story_id = request.GET.get("user_story")
     status = request.GET.get("status")
-    qs = Defect.objects.all()
+    qs = defect_rows()
     if sprint_id:
         qs = qs.filter(user_story__sprint_id=sprint_id)
     if story_id:
         qs = qs.filter(user_story_id=story_id)
     if status:
         qs = qs.filter(status=status)
-    return render(request, "qa/partials/defects_table.html", {"defects": qs})
+    return await render_page(request, qs, "qa/partials/defects_table.html", "defects")
 
-def testcases_view(request):
+@cached_view("testcase", story_param="user_story")
+async def testcases_view(request):
     story_id = request.GET.get("user_story")
-    qs = TestCase.objects.all()
+    qs = testcase_rows()
     if story_id:
         qs = qs.filter(user_story_id=story_id)
-    return render(request, "qa/partials/testcases_table.html", {"testcases": qs})
+    return await render_page(request, qs, "qa/partials/testcases_table.html", "testcases")
 
-def efforts_view(request):
+@cached_view("effort", story_param="user_story")
+async def efforts_view(request):
     story_id = request.GET.get("user_story")
-    qs = Effort.objects.all()
+    qs = effort_rows()
     if story_id:
         qs = qs.filter(user_story_id=story_id)
-    return render(request, "qa/partials/efforts_table.html", {"efforts": qs})
+    return await render_page(request, qs, "qa/partials/efforts_table.html", "efforts")
 
-def userstories_for_sprint(request):
+@cached_view("userstory", sprint_param="sprint_id")
+async def userstories_for_sprint(request):
     sprint_id = request.GET.get("sprint_id")
     qs = UserStory.objects.all()
     if sprint_id:
         qs = qs.filter(sprint_id=sprint_id)
-    data = [{"id": s.id, "title": s.title} for s in qs]
-    return JsonResponse(data, safe=False)
+    return await picker_page(request, qs, "title")
+
+@cached_view("sprint")
+async def sprints_lookup(request):
+    return await picker_page(request, Sprint.objects.all(), "name")
 
-def safe_date(val, only_date=False):
-    """Normalize Excel/Pandas date/time values into Python datetime/date or None."""
-    if val is None or pd.isna(val):
-        return None
+def search_view(request):
+    """Ranked full-text search; ``kind`` narrows to defect, userstory, testcase or comment."""
+    try:
+        offset = int(request.GET.get("cursor") or 0)
+        limit = int(request.GET.get("limit") or 20)
+    except ValueError:
+        return HttpResponseBadRequest("cursor and limit must be integers")
+    hits, next_offset = search(request.GET.get("q", ""), kinds=request.GET.getlist("kind") or None,
+                               offset=offset, limit=limit)
+    return JsonResponse({"results": hits, "next": next_offset})
 
-    import numpy as np
+def instrumentation_report(request):
+    """Recent request timings; local clients only, and only with QA_INSTRUMENTATION on."""
+    if not instrumentation.INSTRUMENTATION or request.META.get("REMOTE_ADDR") not in ("127.0.0.1", "::1"):
+        raise Http404
+    return JsonResponse(instrumentation.report())
 
-    if isinstance(val, pd.Timestamp):
-        return val.to_pydatetime().date() if only_date else val.to_pydatetime()
+async def sprint_metrics(request):
+    sprint_id = request.GET.get("sprint")
+    if not sprint_id:
+        return JsonResponse([summary_dict(s) async for s in SprintSummary.objects.aiterator()], safe=False)
+    try:
+        summary = await sync_to_async(sprint_summary)(int(sprint_id))
+    except ValueError:
+        return HttpResponseBadRequest("sprint must be an integer")
+    if summary is None:
+        raise Http404("No such sprint")
+    return JsonResponse(summary)
 
-    if isinstance(val, (np.datetime64,)):
-        dt = pd.to_datetime(val).to_pydatetime()
-        return dt.date() if only_date else dt
+async def dashboard(request):
+    """The sprint summary and the first page of every table, with row counts, in one response.
 
-    if isinstance(val, (int, float)):
-        try:
-            dt = pd.to_datetime(val, unit="D", origin="1899-12-30")
-            return dt.date() if only_date else dt.to_pydatetime()
-        except Exception:
-            return None
+    The summary and the four tables are queried concurrently. Without
+    ``sprint`` the tables cover every sprint and ``summary`` is null.
+    """
+    sprint_id = request.GET.get("sprint")
+    if sprint_id and not sprint_id.isdigit():
+        return HttpResponseBadRequest("sprint must be an integer")
+    by_story = {"user_story__sprint_id": sprint_id} if sprint_id else {}
+    tables = {
+        "userstories": userstory_rows().filter(**({"sprint_id": sprint_id} if sprint_id else {})),
+        "defects": defect_rows().filter(**by_story),
+        "testcases": testcase_rows().filter(**by_story),
+        "efforts": effort_rows().filter(**by_story),
+    }
 
-    if isinstance(val, datetime):
-        return val.date() if only_date else val
+    async def table(name, qs):
+        (rows, next_cursor), count = await asyncio.gather(paginate(request, qs), qs.acount())
+        html = render_to_string(f"qa/partials/{name}_table.html",
+                                {name: rows, "append": False, "next_cursor": next_cursor}, request)
+        return name, {"html": html, "count": count, "next": next_cursor}
 
-    if isinstance(val, str):
-        try:
-            dt = datetime.fromisoformat(val)
-            return dt.date() if only_date else dt
-        except Exception:
-            try:
-                dt = pd.to_datetime(val).to_pydatetime()
-                return dt.date() if only_date else dt
-            except Exception:
-                return None
+    async def load_summary():
+        return await sync_to_async(sprint_summary)(int(sprint_id)) if sprint_id else None
+
+    try:
+        summary, *pages = await asyncio.gather(load_summary(), *(table(name, qs) for name, qs in tables.items()))
+    except ValueError:
+        return HttpResponseBadRequest("cursor and limit must be integers")
+    if sprint_id and summary is None:
+        raise Http404("No such sprint")
+    return JsonResponse({"sprint": int(sprint_id) if sprint_id else None, "summary": summary,
+                         "tables": dict(pages)})
+
+async def _aiterate(parts):
+    """Pull a sync iterator one part at a time from a thread, so nothing is buffered."""
+    parts = iter(parts)
+    done = object()
+    step = sync_to_async(next)
+    try:
+        while (part := await step(parts, done)) is not done:
+            yield part
+    finally:
+        if hasattr(parts, "close"):
+            await sync_to_async(parts.close)()
 
-    return None
 
+def streamed(request, response):
+    """Give ``response`` an async iterator when served over ASGI.
+
+    Django reads a sync iterator whole before sending any of it under ASGI,
+    which would hold a complete export or API listing in memory.
+    """
+    if isinstance(request, ASGIRequest) and not response.is_async:
+        response.streaming_content = _aiterate(response.streaming_content)
+    return response
+
+def api_rows(request, resource):
+    model = RESOURCES.get(resource)
+    if model is None:
+        raise Http404("Unknown resource")
+    try:
+        qs, fields = build_query(model, request.GET)
+    except (ValueError, ValidationError) as e:
+        return HttpResponseBadRequest(str(e))
+    return streamed(request, StreamingHttpResponse(stream_rows(qs, fields), content_type="application/x-ndjson"))
+
+def export_data(request):
+    fmt = request.GET.get("format", "xlsx")
+    try:
+        content = stream_export(fmt)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    extension, content_type = FORMATS[fmt]
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="qualitrack-export{extension}"'
+    return streamed(request, response)
+
+@csrf_exempt
+@require_POST
+def ingest_test_results(request):
+    """Bulk insert CI results; JUnit XML or NDJSON, chosen by ``format`` or the content type."""
+    fmt = request.GET.get("format") or ("junit" if "xml" in request.content_type else "ndjson")
+    parser = {"junit": parse_junit, "ndjson": parse_ndjson}.get(fmt)
+    if parser is None:
+        return HttpResponseBadRequest("format must be junit or ndjson")
+    try:
+        stats = ingest_results(parser(request), executed_by=request.GET.get("executed_by"),
+                               environment=request.GET.get("environment"))
+    except (ValueError, SyntaxError) as e:
+        # Batches before the malformed part are already stored.
+        return JsonResponse({"success": False, "error": f"Malformed payload: {e}"}, status=400)
+    return JsonResponse({"success": True, **stats})
 
 def upload_file(request):
     if request.method == "POST" and request.FILES.get("file"):
-        file = request.FILES["file"]
         try:
-            xl = pd.ExcelFile(file)
-
-            # --- Helper: bulk insert or update ---
-            def bulk_upsert(model, objs, fields, batch_size = 1000):
-                """Insert new objects and update existing ones."""
-                if not objs:
-                    return
-                # Separate new and existing
-                ids = [obj.id for obj in objs if obj.id is not None]
-                existing = model.objects.filter(id__in=ids).values_list("id", flat=True)
-
-                to_create = [obj for obj in objs if obj.id not in existing]
-                to_update = [obj for obj in objs if obj.id in existing]
-
-                if to_create:
-                    model.objects.bulk_create(to_create, ignore_conflicts=True)
-                if to_update:
-                    model.objects.bulk_update(to_update, fields)
-
-            # --- Sprints ---
-            if "sprints" in xl.sheet_names:
-                df = xl.parse("sprints")
-                objs = []
-                for _, row in df.iterrows():
-                    objs.append(Sprint(
-                        id=row["id"],
-                        name=row["name"],
-                        start_date=safe_date(row.get("start_date"), only_date=True),
-                        end_date=safe_date(row.get("end_date"), only_date=True),
-                        goal=row.get("goal"),
-                    ))
-                bulk_upsert(Sprint, objs, ["name", "start_date", "end_date", "goal"])
-
-            # --- User Stories ---
-            if "userstories" in xl.sheet_names:
-                df = xl.parse("userstories")
-                objs = []
-                for _, row in df.iterrows():
-                    sprint = Sprint.objects.filter(id=row.get("sprint_id")).first()
-                    objs.append(UserStory(
-                        id=row["id"],
-                        sprint=sprint,
-                        title=row["title"],
-                        description=row.get("description"),
-                        created_by=row.get("created_by"),
-                        status=row.get("status"),
-                        story_points=row.get("story_points"),
-                    ))
-                bulk_upsert(UserStory, objs, ["sprint", "title", "description", "created_by", "status", "story_points"])
-
-            # --- Test Cases ---
-            if "testcases" in xl.sheet_names:
-                df = xl.parse("testcases")
-                objs = []
-                for _, row in df.iterrows():
-                    story = UserStory.objects.filter(id=row.get("user_story_id")).first()
-                    objs.append(TestCase(
-                        id=row["id"],
-                        user_story=story,
-                        title=row["title"],
-                        description=row.get("description"),
-                        created_by=row.get("created_by"),
-                    ))
-                bulk_upsert(TestCase, objs, ["user_story", "title", "description", "created_by"])
-
-            # --- Defects ---
-            if "defects" in xl.sheet_names:
-                df = xl.parse("defects")
-                objs = []
-                for _, row in df.iterrows():
-                    story = UserStory.objects.filter(id=row.get("user_story_id")).first()
-                    tc = TestCase.objects.filter(id=row.get("test_case_id")).first()
-                    objs.append(Defect(
-                        id=row["id"],
-                        user_story=story,
-                        test_case=tc,
-                        title=row.get("title"),
-                        description=row.get("description"),
-                        status=row.get("status"),
-                        severity=row.get("severity"),
-                        priority=row.get("priority"),
-                        reported_by=row.get("reported_by"),
-                        assigned_to=row.get("assigned_to"),
-                    ))
-                bulk_upsert(Defect, objs, ["user_story", "test_case", "title", "description",
-                                           "status", "severity", "priority", "reported_by", "assigned_to"])
-
-            # --- Efforts ---
-            if "efforts" in xl.sheet_names:
-                df = xl.parse("efforts")
-                objs = []
-                for _, row in df.iterrows():
-                    story = UserStory.objects.filter(id=row.get("user_story_id")).first()
-                    objs.append(Effort(
-                        id=row["id"],
-                        user_story=story,
-                        user=row.get("user_name"),
-                        effort_type=row.get("effort_type"),
-                        hours=row.get("hours"),
-                        logged_at=safe_date(row.get("logged_at")),
-                    ))
-                bulk_upsert(Effort, objs, ["user_story", "user", "effort_type", "hours", "logged_at"])
-
-            return JsonResponse({"success": True, "message": "All sheets uploaded successfully"})
+            job = enqueue(request.FILES["file"], incremental=bool(request.POST.get("incremental")))
+            return JsonResponse({"success": True, "message": "Upload queued for import",
+                                 "job_id": job.pk, "status_url": reverse("import_job", args=[job.pk])})
 
         except Exception as e:
             return JsonResponse({"success": False, "error": str(e)})
 
-    return JsonResponse({"success": False, "error": "No file uploaded"})
\ No newline at end of file
+    return JsonResponse({"success": False, "error": "No file uploaded"})
+
+def import_job(request, job_id):
+    job = get_object_or_404(ImportJob, pk=job_id)
+    return JsonResponse({
+        "id": job.pk,
+        "status": job.status,
+        "sheets": job.progress,
+        "error": job.error,
+        "errors_url": reverse("import_job_errors", args=[job.pk]) if job.error_report else None,
+    })
+
+def import_job_errors(request, job_id):
+    """The rows a job rejected, as CSV: sheet, row, id, column, value, error."""
+    job = get_object_or_404(ImportJob, pk=job_id)
+    if not job.error_report:
+        raise Http404("No rows were rejected")
+    return streamed(request, FileResponse(job.error_report.open("rb"), as_attachment=True,
+                                          filename=f"import-{job.pk}-errors.csv", content_type="text/csv"))
@@ -0,0 +1,25 @@
+"""Settings for ``manage.py benchmark import``.
+
+Uses a throwaway SQLite database and media directory, so the suite runs
+without a PostgreSQL server and never touches real data.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "benchmark.sqlite3",
+    }
+}
+MEDIA_ROOT = BASE_DIR / "benchmark-media"
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "benchmark-cache",
+    }
+}
+# Without DEBUG no SQL is kept in memory, so peak RSS reflects the import itself.
+DEBUG = False
+ALLOWED_HOSTS = ["testserver"]
+QA_BENCHMARK_DB = True